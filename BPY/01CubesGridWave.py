@@ -1,12 +1,14 @@
 #!/usr/bin/env -S blender --factory-startup --python
 
 # name: Animated grid of cubes
-# blender: 2.92.0
+# blender: 3.6
 # ref: [CG Cookie - Animating With Python](https://www.youtube.com/watch?v=QnvN1dieIAU)
 # ref: [BPY Documentation](https://docs.blender.org/api/current/)
 # ref: [Python Performance with Blender operators](https://blender.stackexchange.com/a/7360)
 
-import sys, itertools, math, importlib
+import sys, itertools, math, importlib, argparse, json
+from pathlib import Path
+import numpy as np
 import bpy, bmesh, mathutils
 
 # ref: https://docs.blender.org/api/current/info_tips_and_tricks.html#executing-modules
@@ -15,6 +17,15 @@ if '.' not in sys.path:
 import shared
 importlib.reload(shared)
 
+# Wave animation of a single cube: (frame offset, scale) keyframes. Each cube
+# of a grid starts `delay` frames after the previous one.
+WAVE_KEYFRAMES = (
+    (0,  (0.0, 0.0, 0.0)),
+    (49, (1.0, 1.0, 5.0)),
+    (69, (1.0, 1.0, 0.5)),
+    (79, (1.0, 1.0, 1.0)),
+)
+
 # Create a template cube.
 def new_cube() -> bpy.types.Object:
     # mesh & object (alt: bpy.ops.mesh.primitive_cube_add())
@@ -27,7 +38,6 @@ def new_cube() -> bpy.types.Object:
     # materials
     material = bpy.data.materials.new(name='Material')
     material.use_nodes = True
-    obj.data.materials.append(material)
 
     ## shader nodes (tip: organize nodes in GUI w/ 'Node Arrange' addon)
     nodes = material.node_tree.nodes
@@ -43,32 +53,251 @@ def new_cube() -> bpy.types.Object:
     links.new(nodes['Emission'].outputs['Emission'],
               nodes['Material Output'].inputs['Surface'])
 
+    obj.data.materials.append(shared.material_dedup(material))
     return obj
 
-# Create a 10*10 animated grid of `obj` objects.
-def new_grid(obj: bpy.types.Object) -> bpy.types.Collection:
+# Create a shape[0]*shape[1] animated grid of `obj` objects.
+def new_grid(obj: bpy.types.Object, shape: tuple[int, int] = (10, 10),
+             delay: float = 1.0) -> bpy.types.Collection:
     # grid
     collection = bpy.data.collections.new('Grid')
-    for x, y in itertools.product(range(10), repeat=2):
+    for x, y in itertools.product(range(shape[0]), range(shape[1])):
         c = obj.copy()
         c.location[0] = x * 2
         c.location[1] = y * 2
         collection.objects.link(c)
 
     # animation
-    for i, obj in enumerate(collection.objects):
-        obj.scale = (0, 0, 0)
-        obj.keyframe_insert(data_path='scale', frame=1 + i)
-        obj.scale = (1, 1, 5)
-        obj.keyframe_insert(data_path='scale', frame=50 + i)
-        obj.scale = (1, 1, 0.5)
-        obj.keyframe_insert(data_path='scale', frame=70 + i)
-        obj.scale = (1, 1, 1)
-        obj.keyframe_insert(data_path='scale', frame=80 + i)
+    offsets = np.array([frame for frame, _ in WAVE_KEYFRAMES])
+    scales = np.array([scale for _, scale in WAVE_KEYFRAMES])
+    n = len(collection.objects)
+    shared.keyframes_insert_bulk(collection.objects, 'scale',
+        frames=1 + np.arange(n)[:, None] * delay + offsets,
+        values=np.broadcast_to(scales, (n, *scales.shape)),
+    )
+
+    return collection
+
+# Create a shape[0]*shape[1] animated grid of `obj` instances. Scales to
+# millions of cells: a single point cloud stores the cells and their
+# 'cell_index' attribute, and a geometry nodes modifier instances `obj` on
+# each cell and animates it from its index.
+def new_grid_instanced(obj: bpy.types.Object, shape: tuple[int, int],
+                       delay: float = 1.0) -> bpy.types.Collection:
+    # points (same cell order as new_grid())
+    n = shape[0] * shape[1]
+    x, y = np.meshgrid(np.arange(shape[0]), np.arange(shape[1]), indexing='ij')
+    co = np.zeros((n, 3), dtype=np.float32)
+    co[:, 0] = x.ravel() * 2
+    co[:, 1] = y.ravel() * 2
+
+    mesh = bpy.data.meshes.new('Grid')
+    mesh.vertices.add(n)
+    mesh.vertices.foreach_set('co', co.ravel())
+    mesh.attributes.new('cell_index', type='INT', domain='POINT') \
+        .data.foreach_set('value', np.arange(n, dtype=np.int32))
+    mesh.update()
+
+    # object & instancing modifier
+    grid = bpy.data.objects.new('Grid', mesh)
+    modifier = grid.modifiers.new(name='Wave', type='NODES')
+    modifier.node_group = new_wave_node_group(obj, delay)
 
+    collection = bpy.data.collections.new('Grid')
+    collection.objects.link(grid)
     return collection
 
-def setup_scene(collection: bpy.types.Collection) -> None:
+# Geometry nodes: instance `instance_obj` on each input point and scale it
+# following WAVE_KEYFRAMES, offset by the point's 'cell_index' * `delay`.
+def new_wave_node_group(
+    instance_obj: bpy.types.Object, delay: float
+) -> bpy.types.NodeTree:
+    group = bpy.data.node_groups.new('Wave', 'GeometryNodeTree')
+    if hasattr(group, 'interface'): # blender >= 4.0
+        group.interface.new_socket('Geometry', in_out='INPUT',
+                                   socket_type='NodeSocketGeometry')
+        group.interface.new_socket('Geometry', in_out='OUTPUT',
+                                   socket_type='NodeSocketGeometry')
+    else:
+        group.inputs.new('NodeSocketGeometry', 'Geometry')
+        group.outputs.new('NodeSocketGeometry', 'Geometry')
+
+    ## nodes
+    nodes = group.nodes
+    nodes.new('NodeGroupInput')
+    nodes.new('NodeGroupOutput')
+    nodes.new('GeometryNodeObjectInfo')
+    nodes['Object Info'].inputs['Object'].default_value = instance_obj
+    nodes.new('GeometryNodeInstanceOnPoints')
+    nodes.new('GeometryNodeInputSceneTime')
+    nodes.new('GeometryNodeInputNamedAttribute')
+    nodes['Named Attribute'].inputs['Name'].default_value = 'cell_index'
+
+    ### local time of the cell: (frame - cell_index * delay) in [0, 1]
+    nodes.new('ShaderNodeMath').name = 'Delay'
+    nodes['Delay'].operation = 'MULTIPLY'
+    nodes['Delay'].inputs[1].default_value = delay
+    nodes.new('ShaderNodeMath').name = 'Local Frame'
+    nodes['Local Frame'].operation = 'SUBTRACT'
+    nodes.new('ShaderNodeMapRange')
+    nodes['Map Range'].inputs['From Min'].default_value = 1
+    nodes['Map Range'].inputs['From Max'].default_value = 1 + WAVE_KEYFRAMES[-1][0]
+
+    ### scale curves, normalized to [0, 1] then rescaled: the keyframed
+    ### wave, sampled twice per frame
+    length = WAVE_KEYFRAMES[-1][0]
+    substeps = 2
+    profile = wave_profile(substeps)
+    for axis, i in (('XY', 0), ('Z', 2)):
+        vmax = max(scale[i] for _, scale in WAVE_KEYFRAMES)
+        curve = nodes.new('ShaderNodeFloatCurve')
+        curve.name = f'Curve {axis}'
+        float_curve_set(curve, [(k / (length * substeps), value / vmax)
+                                for k, value in enumerate(profile[:, i])])
+        nodes.new('ShaderNodeMath').name = f'Scale {axis}'
+        nodes[f'Scale {axis}'].operation = 'MULTIPLY'
+        nodes[f'Scale {axis}'].inputs[1].default_value = vmax
+    nodes.new('ShaderNodeCombineXYZ')
+
+    ## links between nodes
+    links = group.links
+    links.new(nodes['Named Attribute'].outputs['Attribute'],
+              nodes['Delay'].inputs[0])
+    links.new(nodes['Scene Time'].outputs['Frame'],
+              nodes['Local Frame'].inputs[0])
+    links.new(nodes['Delay'].outputs['Value'], nodes['Local Frame'].inputs[1])
+    links.new(nodes['Local Frame'].outputs['Value'],
+              nodes['Map Range'].inputs['Value'])
+    for axis in ('XY', 'Z'):
+        links.new(nodes['Map Range'].outputs['Result'],
+                  nodes[f'Curve {axis}'].inputs['Value'])
+        links.new(nodes[f'Curve {axis}'].outputs['Value'],
+                  nodes[f'Scale {axis}'].inputs[0])
+    links.new(nodes['Scale XY'].outputs['Value'],
+              nodes['Combine XYZ'].inputs['X'])
+    links.new(nodes['Scale XY'].outputs['Value'],
+              nodes['Combine XYZ'].inputs['Y'])
+    links.new(nodes['Scale Z'].outputs['Value'],
+              nodes['Combine XYZ'].inputs['Z'])
+    links.new(nodes['Group Input'].outputs['Geometry'],
+              nodes['Instance on Points'].inputs['Points'])
+    links.new(nodes['Object Info'].outputs['Geometry'],
+              nodes['Instance on Points'].inputs['Instance'])
+    links.new(nodes['Combine XYZ'].outputs['Vector'],
+              nodes['Instance on Points'].inputs['Scale'])
+    links.new(nodes['Instance on Points'].outputs['Instances'],
+              nodes['Group Output'].inputs['Geometry'])
+
+    return group
+
+# Replace the points of a float curve node, joined by straight segments
+# (vector handles): with dense samples of an F-curve, e.g. wave_profile(), the
+# node follows it closely, which a few curve mapping points with auto
+# handles would not (their handles work on the normalized axes, not frames).
+def float_curve_set(node: bpy.types.Node,
+                    points: list[tuple[float, float]]) -> None:
+    curve = node.mapping.curves[0]
+    curve.points[0].location = points[0]
+    curve.points[-1].location = points[-1]
+    for point in points[1:-1]:
+        curve.points.new(*point)
+    for point in curve.points:
+        point.handle_type = 'VECTOR'
+    node.mapping.update()
+
+# Sample the wave animation of a single cube with `substeps` samples per
+# frame, from a temporary F-curve so that samples follow Blender's Bezier
+# interpolation. Returns a (samples, 3) array of scales.
+def wave_profile(substeps: int = 8) -> np.ndarray:
+    length = WAVE_KEYFRAMES[-1][0]
+    times = np.linspace(0, length, length * substeps + 1)
+    profile = np.empty((len(times), 3), dtype=np.float32)
+
+    action = bpy.data.actions.new('WaveProfile')
+    for channel in range(3):
+        fcurve = action.fcurves.new('scale', index=channel)
+        fcurve.keyframe_points.add(len(WAVE_KEYFRAMES))
+        fcurve.keyframe_points.foreach_set('co', [
+            v for frame, scale in WAVE_KEYFRAMES for v in (frame, scale[channel])
+        ])
+        fcurve.update()
+        profile[:, channel] = [fcurve.evaluate(t) for t in times]
+    bpy.data.actions.remove(action)
+
+    return profile
+
+# Export the grid animation as a vertex animation texture (VAT) and a single
+# merged static mesh, for engines which can't play hundreds of animated
+# objects cheaply. The texture is computed from the keyframe schedule:
+# cell i at frame f shows the wave profile at local time f - 1 - i * delay.
+# Writes `path`.bin (arrays) and `path`.json (arrays layout):
+# * vat: float16 (frames, cells, 3) scale of each cell at each frame
+# * origins: float32 (cells, 3) location of each cell
+# * positions: float32 (verts, 3) rest positions of the merged mesh
+# * cell_index: uint32 (verts,) cell of each vertex
+# * indices: uint32 (tris, 3) triangles of the merged mesh
+# Shader: pos = origins[i] + (positions - origins[i]) * vat[frame, i]
+# `obj` is a cell of the grid (or the template of an instanced grid).
+def export_vat(obj: bpy.types.Object, shape: tuple[int, int], delay: float,
+               frame_end: int, path: Path) -> None:
+    # texture
+    cells = shape[0] * shape[1]
+    length = WAVE_KEYFRAMES[-1][0]
+    profile = wave_profile()
+    times = np.linspace(0, length, len(profile))
+    local = np.arange(1, frame_end + 1)[:, None] - 1 - np.arange(cells) * delay
+    local = np.clip(local, 0, length)
+    vat = np.stack([np.interp(local, times, profile[:, channel])
+                    for channel in range(3)], axis=-1).astype(np.float16)
+
+    # cell origins (same cell order as new_grid())
+    x, y = np.meshgrid(np.arange(shape[0]), np.arange(shape[1]), indexing='ij')
+    origins = np.zeros((cells, 3), dtype=np.float32)
+    origins[:, 0] = x.ravel() * 2
+    origins[:, 1] = y.ravel() * 2
+
+    # evaluated mesh of a single cell (i.e. with the wireframe modifier), in
+    # local coordinates so the cell's animated scale doesn't matter; `obj` must
+    # be in the evaluated depsgraph, so an unlinked template (the instanced
+    # grid's) is linked to the scene while evaluating it
+    scene = bpy.context.scene
+    unlinked = not obj.users_scene
+    if unlinked:
+        scene.collection.objects.link(obj)
+    bm = bmesh.new()
+    bm.from_object(obj, bpy.context.evaluated_depsgraph_get())
+    if unlinked:
+        scene.collection.objects.unlink(obj)
+    mesh = bpy.data.meshes.new('VAT')
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.calc_loop_triangles()
+    co = np.empty(3 * len(mesh.vertices), dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    tris = np.empty(3 * len(mesh.loop_triangles), dtype=np.uint32)
+    mesh.loop_triangles.foreach_get('vertices', tris)
+    bpy.data.meshes.remove(mesh)
+
+    # merged mesh: one copy of the cell mesh per cell
+    nverts = len(co) // 3
+    positions = (co.reshape(1, -1, 3) + origins[:, None]).reshape(-1, 3)
+    cell_index = np.repeat(np.arange(cells, dtype=np.uint32), nverts)
+    indices = (tris.reshape(1, -1, 3)
+            + (np.arange(cells, dtype=np.uint32) * nverts)[:, None, None])
+
+    # write arrays & layout
+    layout = { 'frame_start': 1, 'frame_end': frame_end, 'arrays': {} }
+    with open(path.with_suffix('.bin'), 'wb') as f:
+        for name, array in (
+            ('vat', vat), ('origins', origins), ('positions', positions),
+            ('cell_index', cell_index), ('indices', indices.reshape(-1, 3)),
+        ):
+            layout['arrays'][name] = { 'offset': f.tell(),
+                'dtype': array.dtype.name, 'shape': array.shape }
+            f.write(np.ascontiguousarray(array).tobytes())
+    path.with_suffix('.json').write_text(json.dumps(layout, indent=4))
+
+def setup_scene(collection: bpy.types.Collection, frame_end: int) -> None:
     # add collection to Scene Collection
     scene = bpy.data.scenes['Scene']
     scene.collection.children.link(collection)
@@ -84,11 +313,29 @@ def setup_scene(collection: bpy.types.Collection) -> None:
     bpy.data.worlds['World'] \
        .node_tree.nodes["Background"] \
        .inputs['Color'].default_value = (0, 0, 0, 1)
-    scene.frame_end = 80 + len(collection.objects)
+    scene.frame_end = frame_end
     scene.eevee.use_bloom = True
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shape', type=int, nargs=2, default=(10, 10))
+    parser.add_argument('--delay', type=float, default=1.0)
+    parser.add_argument('--instanced', action='store_true',
+                        help='use geometry nodes instancing, for large grids')
+    parser.add_argument('--vat', type=Path, metavar='PATH',
+                        help='export a vertex animation texture to PATH.bin')
+    args = parser.parse_args(shared.argv())
+
     shared.delete_data()
     cube = new_cube()
-    grid = new_grid(obj=cube)
-    setup_scene(collection=grid)
+    if args.instanced:
+        grid = new_grid_instanced(obj=cube, shape=args.shape, delay=args.delay)
+    else:
+        grid = new_grid(obj=cube, shape=args.shape, delay=args.delay)
+    cells = args.shape[0] * args.shape[1]
+    frame_end = math.ceil(80 + cells * args.delay)
+    setup_scene(collection=grid, frame_end=frame_end)
+    if args.vat:
+        cell = cube if args.instanced else grid.objects[0]
+        export_vat(cell, args.shape, args.delay, frame_end, args.vat)
+    shared.material_report()
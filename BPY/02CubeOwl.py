@@ -4,7 +4,8 @@
 # blender: 3.6
 # ref: https://cloud.blender.org/training/primitive-animals/
 
-import sys, math, importlib
+import sys, math, importlib, argparse
+from pathlib import Path
 
 import numpy as np
 
@@ -106,10 +107,10 @@ class Owl:
         # materials
         material = bpy.data.materials.new('Body')
         material.use_nodes = True
-        obj.data.materials.append(material)
         nodes = material.node_tree.nodes
         nodes["Principled BSDF"].inputs['Base Color'].default_value = \
             [0.25, 0.13, 0.05, 1.0]
+        obj.data.materials.append(shared.material_dedup(material))
 
         return obj
 
@@ -163,10 +164,10 @@ class Owl:
 
         material = bpy.data.materials.new('Face')
         material.use_nodes = True
-        obj.data.materials.append(material)
         nodes = material.node_tree.nodes
         nodes["Principled BSDF"].inputs['Base Color'].default_value = \
             [0.80, 0.62, 0.41, 1.0]
+        obj.data.materials.append(shared.material_dedup(material))
 
 
         return obj
@@ -190,10 +191,10 @@ class Owl:
 
         material = bpy.data.materials.new('Beak')
         material.use_nodes = True
-        obj.data.materials.append(material)
         nodes = material.node_tree.nodes
         nodes["Principled BSDF"].inputs['Base Color'].default_value = \
             [0.80, 0.39, 0.06, 1.0]
+        obj.data.materials.append(shared.material_dedup(material))
 
         return obj
 
@@ -210,11 +211,11 @@ class Owl:
 
         material = bpy.data.materials.new('Eyes')
         material.use_nodes = True
-        obj.data.materials.append(material)
         nodes = material.node_tree.nodes
         nodes["Principled BSDF"].inputs['Base Color'].default_value = \
             [0.0, 0.0, 0.0, 1.0]
         nodes['Principled BSDF'].inputs['Roughness'].default_value = 0.125
+        obj.data.materials.append(shared.material_dedup(material))
 
         return obj
 
@@ -375,10 +376,10 @@ class Owl:
 
         material = bpy.data.materials.new('Claws')
         material.use_nodes = True
-        claws.data.materials.append(material)
         nodes = material.node_tree.nodes
         nodes["Principled BSDF"].inputs['Base Color'].default_value = \
             [0.060, 0.037, 0.026, 1.0]
+        claws.data.materials.append(shared.material_dedup(material))
 
         return objs
 
@@ -414,5 +415,13 @@ def setup_scene():
     scene.eevee.use_bloom = True
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--glb', type=Path, metavar='PATH',
+                        help='export the owl to a glTF binary file')
+    args = parser.parse_args(shared.argv())
+
     shared.delete_data()
     setup_scene()
+    shared.material_report()
+    if args.glb:
+        shared.export_glb_objects(args.glb, C.scene.objects)
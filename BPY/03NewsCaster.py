@@ -3,7 +3,7 @@
 # blender: 3.0
 # ref: Mega Man Legends News Caster
 
-import sys, importlib, dataclasses
+import sys, importlib, argparse, dataclasses
 from math import radians
 from pathlib import Path
 
@@ -545,7 +545,7 @@ class Character:
         links.new(nodes['Image Texture'].outputs['Color'],
                   nodes['Principled BSDF'].inputs['Base Color'])
 
-        return material
+        return shared.material_dedup(material)
 
     @classmethod
     def texture(cls) -> bpy.types.Image:
@@ -561,5 +561,15 @@ class Character:
         return D.images.load(filepath, check_existing=True)
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--glb', type=Path, metavar='PATH',
+                        help='export the character (and its texture) to a '
+                             'glTF binary file')
+    args = parser.parse_args(shared.argv())
+
     shared.delete_data()
-    D.scenes[0].collection.objects.link(Character.object())
+    character = Character.object()
+    D.scenes[0].collection.objects.link(character)
+    shared.material_report()
+    if args.glb:
+        shared.export_glb_objects(args.glb, [character])
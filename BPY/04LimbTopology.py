@@ -3,9 +3,12 @@
 # blender: 3.0
 # ref: http://wiki.polycount.com/wiki/Limb_Topology
 
-import sys, importlib
+import sys, importlib, argparse
+from pathlib import Path
 from math import radians
 
+import numpy as np
+
 import bpy, bmesh
 from mathutils import Matrix, Quaternion
 C = bpy.context
@@ -13,60 +16,43 @@ D = bpy.data
 
 if '.' not in sys.path:
     sys.path.append('.')
-import shared
+import shared, skinning
 importlib.reload(shared)
+importlib.reload(skinning)
 
-def add_limb_one_loop() -> bpy.types.Object:
-    # bmesh
-    bm = bmesh.new()
-    bm_cylinder_zcuts(bm, segments=16, radius=0.1, zcuts=(0.2, 0.2))
-
+def add_limb_one_loop(rig: 'LimbRig', profile='HARD') -> bpy.types.Object:
     # mesh & object
     mesh = D.meshes.new('limb_one_loop')
+    shared.mesh_from_arrays(mesh, *cylinder_zcuts(
+        segments=16, radius=0.1, zcuts=(0.2, 0.2)
+    ))
     object = D.objects.new(mesh.name, mesh)
     C.scene.collection.objects.link(object)
 
     # vertex groups
-    # ref: https://docs.blender.org/api/current/bmesh.html#customdata-access
-    deform_layer = bm.verts.layers.deform.new()
-    b1_vg = object.vertex_groups.new(name='limb.001')
-    for vert in bm.verts[0:32]:
-        vert[deform_layer][b1_vg.index] = 1.0
-    b2_vg = object.vertex_groups.new(name='limb.002')
-    for vert in bm.verts[16:48]:
-        vert[deform_layer][b2_vg.index] = 1.0
-    bm.to_mesh(mesh)
-    bm.free()
+    b1_vg, b2_vg = add_limb_weights(object, joint=(0.2, 0.2), width=0.2,
+                                    profile=profile)
 
     # armature
-    return add_limb_armature(object, b1_vg.name, b2_vg.name)
-
-def add_limb_two_loops() -> bpy.types.Object:
-    # bmesh
-    bm = bmesh.new()
-    bm_cylinder_zcuts(bm, segments=16, radius=0.1, zcuts=(0.19, 0.01, 0.2))
+    return rig.add(object, b1_vg.name, b2_vg.name)
 
+def add_limb_two_loops(rig: 'LimbRig', profile='HARD') -> bpy.types.Object:
     # mesh & object
     mesh = D.meshes.new('limb_two_loops')
+    shared.mesh_from_arrays(mesh, *cylinder_zcuts(
+        segments=16, radius=0.1, zcuts=(0.19, 0.01, 0.2)
+    ))
     object = D.objects.new(mesh.name, mesh)
     C.scene.collection.objects.link(object)
 
     # vertex groups
-    # ref: https://docs.blender.org/api/current/bmesh.html#customdata-access
-    deform_layer = bm.verts.layers.deform.new()
-    b1_vg = object.vertex_groups.new(name='limb.001')
-    for vert in bm.verts[0:32]:
-        vert[deform_layer][b1_vg.index] = 1.0
-    b2_vg = object.vertex_groups.new(name='limb.002')
-    for vert in bm.verts[32:]:
-        vert[deform_layer][b2_vg.index] = 1.0
-    bm.to_mesh(mesh)
-    bm.free()
+    b1_vg, b2_vg = add_limb_weights(object, joint=(0.19, 0.2), width=0.19,
+                                    profile=profile)
 
     # armature
-    return add_limb_armature(object, b1_vg.name, b2_vg.name)
+    return rig.add(object, b1_vg.name, b2_vg.name)
 
-def add_limb_one_triangle() -> bpy.types.Object:
+def add_limb_one_triangle(rig: 'LimbRig', profile='HARD') -> bpy.types.Object:
     # bmesh
     bm = bmesh.new()
     bmesh.ops.create_circle(bm, segments=16, radius=0.1)
@@ -95,75 +81,229 @@ def add_limb_one_triangle() -> bpy.types.Object:
 
     # mesh & object
     mesh = D.meshes.new('limb_one_triangle')
+    bm.to_mesh(mesh)
+    bm.free()
     object = D.objects.new(mesh.name, mesh)
     C.scene.collection.objects.link(object)
 
-    # vertex groups
-    # ref: https://docs.blender.org/api/current/bmesh.html#customdata-access
-    deform_layer = bm.verts.layers.deform.new()
-    b1_vg = object.vertex_groups.new(name='limb.001')
-    for vert in bm.verts[0:32]:
-        vert[deform_layer][b1_vg.index] = 1.0
-    b2_vg = object.vertex_groups.new(name='limb.002')
-    for vert in bm.verts[16:24] + bm.verts[31:]:
-        vert[deform_layer][b2_vg.index] = 1.0
-    bm.to_mesh(mesh)
-    bm.free()
+    # vertex groups: the joint loop is sheared, hard weights are assigned from
+    # the topology rather than from z coordinates
+    if profile == 'HARD':
+        n = len(mesh.vertices)
+        b1_vg = object.vertex_groups.new(name='limb.001')
+        b1_vg.add(list(range(0, 32)), 1.0, 'REPLACE')
+        b2_vg = object.vertex_groups.new(name='limb.002')
+        b2_vg.add(list(range(16, 24)) + list(range(31, n)), 1.0, 'REPLACE')
+    else:
+        b1_vg, b2_vg = add_limb_weights(object, joint=(0.2, 0.2), width=0.2,
+                                        profile=profile)
 
     # armature
-    return add_limb_armature(object, b1_vg.name, b2_vg.name)
+    return rig.add(object, b1_vg.name, b2_vg.name)
+
+# Add the vertex groups of the limb's two bones, weighted from the vertices' z
+# coordinates (cf. shared.joint_weights()).
+def add_limb_weights(object, joint, width, profile):
+    z = shared.mesh_coords(object.data)[:, 2]
+    weights = shared.joint_weights(z, joint, profile, width)
+    vgs = []
+    for name, w in zip(('limb.001', 'limb.002'), weights):
+        vgs.append(object.vertex_groups.new(name=name))
+        shared.vertex_group_set(vgs[-1], w)
+    return vgs
+
+# Vertices and quads of a cylinder made of rings, computed directly as arrays.
+# The topology and vertex order are the same as extruding a bmesh circle ring
+# by ring (bmesh.ops.create_circle() then extrude_edge_only()): vertex k of
+# ring r has index r * segments + k.
+# * zcuts: z offset of each ring relative to the previous one
+# * shears: optional z += shear * x shear of each ring relative to the
+#   previous one, i.e. Matrix.Shear('YZ', 4, (0, shear))
+def cylinder_zcuts(segments, radius, zcuts, shears=None):
+    phi = 2 * np.pi * np.arange(segments) / segments
+    x = -radius * np.sin(phi)
+    z = np.concatenate(([0.0], np.cumsum(zcuts)))
+    shear = np.concatenate(([0.0], np.cumsum(shears))) if shears is not None \
+            else np.zeros_like(z)
 
-def bm_cylinder_zcuts(bm, zcuts, **kwargs):
-    bmesh.ops.create_circle(bm, **kwargs)
-    c_old = { 'verts': bm.verts[:], 'edges': bm.edges[:], 'faces': bm.faces[:] }
-    for z in zcuts:
-        c_new = bmesh.ops.extrude_edge_only(bm, edges=c_old['edges'])
-        c_new = shared.bm_geom_split(c_new['geom'])
-        bmesh.ops.translate(bm, verts=c_new['verts'], vec=(0, 0, z))
-        c_old = c_new
+    verts = np.empty((len(z), segments, 3), dtype=np.float32)
+    verts[..., 0] = x
+    verts[..., 1] = radius * np.cos(phi)
+    verts[..., 2] = z[:, None] + shear[:, None] * x
 
+    k = np.arange(segments)
+    ring = np.arange(len(z) - 1)[:, None] * segments
+    faces = np.stack((ring + k, ring + (k + 1) % segments,
+                      ring + segments + (k + 1) % segments,
+                      ring + segments + k), axis=-1)
+
+    return verts.reshape(-1, 3), faces.reshape(-1, 4)
+
+# Armatures of several limbs. Bones can only be created in edit mode, and
+# mode switches are slow: add() all the limbs first, then build() creates the
+# bones of every armature in a single (multi-object) edit mode session.
 # ref: https://www.youtube.com/watch?v=cZ3o5tjO51s
 # ref: https://blender.stackexchange.com/a/51697
-def add_limb_armature(object, b1_name, b2_name):
-    # armature
-    armature = D.armatures.new('armature')
-    armature = D.objects.new(armature.name, armature)
-    armature.show_in_front = True
-    C.scene.collection.objects.link(armature)
-
-    C.view_layer.objects.active = armature
-    bpy.ops.object.mode_set(mode='EDIT')
-    bones = armature.data.edit_bones
-    b1 = bones.new(b1_name)
-    b1.head = (0.0, 0.0, 0.0)
-    b1.tail = (0.0, 0.0, 0.2)
-    b2 = bones.new(b2_name)
-    b2.head = (0.0, 0.0, 0.0)
-    b2.tail = (0.0, 0.0, 0.4)
-    b2.parent = b1
-    b2.use_connect = True
-    bpy.ops.object.mode_set(mode='OBJECT')
-
-    # set armature as parent to object
-    object.parent = armature
-    modifier = object.modifiers.new(name='armature', type='ARMATURE')
-    modifier.object = armature
-
-    # set poses & keyframes
-    pose_bones = armature.pose.bones
-    pose_bones[b2_name].keyframe_insert(data_path='rotation_quaternion', frame=1)
-    pose_bones[b2_name].keyframe_insert(data_path='rotation_quaternion', frame=100)
-    pose_bones[b2_name].rotation_quaternion = Quaternion((0, 0, 1), radians(-90))
-    pose_bones[b2_name].keyframe_insert(data_path='rotation_quaternion', frame=50)
-
-    return armature
+class LimbRig:
+    def __init__(self) -> None:
+        self.limbs: list[tuple[bpy.types.Object, bpy.types.Object, str, str]] = []
+
+    # Create the armature which will deform `object`. Its bones `b1_name` and
+    # `b2_name` are created by build().
+    def add(self, object, b1_name, b2_name) -> bpy.types.Object:
+        armature = D.armatures.new('armature')
+        armature = D.objects.new(armature.name, armature)
+        armature.show_in_front = True
+        C.scene.collection.objects.link(armature)
+        self.limbs.append((armature, object, b1_name, b2_name))
+        return armature
+
+    def build(self) -> None:
+        if not self.limbs:
+            return
+        armatures = [armature for armature, *_ in self.limbs]
+
+        # bones: entering edit mode with several armatures selected edits all
+        # of them at once
+        for obj in C.view_layer.objects:
+            obj.select_set(obj in armatures)
+        C.view_layer.objects.active = armatures[0]
+        bpy.ops.object.mode_set(mode='EDIT')
+        for armature, _, b1_name, b2_name in self.limbs:
+            bones = armature.data.edit_bones
+            b1 = bones.new(b1_name)
+            b1.head = (0.0, 0.0, 0.0)
+            b1.tail = (0.0, 0.0, 0.2)
+            b2 = bones.new(b2_name)
+            b2.head = (0.0, 0.0, 0.0)
+            b2.tail = (0.0, 0.0, 0.4)
+            b2.parent = b1
+            b2.use_connect = True
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+        # set armatures as parents to objects
+        for armature, object, _, _ in self.limbs:
+            object.parent = armature
+            modifier = object.modifiers.new(name='armature', type='ARMATURE')
+            modifier.object = armature
+
+        # set poses & keyframes
+        rest = Quaternion()
+        bent = Quaternion((0, 0, 1), radians(-90))
+        pose_bones = [armature.pose.bones[b2_name]
+                      for armature, _, _, b2_name in self.limbs]
+        shared.keyframes_insert_bulk(pose_bones, 'rotation_quaternion',
+            frames=(1, 50, 100),
+            values=[(rest, bent, rest)] * len(pose_bones),
+        )
+        for pose_bone in pose_bones:
+            pose_bone.rotation_quaternion = bent
+
+# Inputs of skinning.lbs() for a limb: rest positions, triangles, weights and
+# the skinning matrices of `frames`. The pose is evaluated from the
+# armature's F-curves, without changing the current frame.
+def limb_skinning_data(object, armature, frames):
+    mesh = object.data
+    rest = shared.mesh_coords(mesh).astype(np.float64)
+    mesh.calc_loop_triangles()
+    tris = np.empty(3 * len(mesh.loop_triangles), dtype=np.int32)
+    mesh.loop_triangles.foreach_get('vertices', tris)
+
+    bones = armature.data.bones
+    weights = shared.vertex_group_weights(
+        object, [bone.name for bone in bones]
+    ).astype(np.float64)
+
+    # bones & poses
+    rest_mats = np.array([bone.matrix_local for bone in bones])
+    parents = [bones.find(b.parent.name) if b.parent else -1 for b in bones]
+    action = armature.animation_data and armature.animation_data.action
+    def channels(pose_bone, prop):
+        values = np.tile(np.array(getattr(pose_bone, prop)), (len(frames), 1))
+        path = pose_bone.path_from_id(prop)
+        for i in range(values.shape[1]):
+            fcurve = action and action.fcurves.find(path, index=i)
+            if fcurve:
+                values[:, i] = [fcurve.evaluate(f) for f in frames]
+        return values
+
+    basis = np.tile(np.eye(4), (len(frames), len(bones), 1, 1))
+    for b, bone in enumerate(bones):
+        pose_bone = armature.pose.bones[bone.name]
+        scale = np.tile(np.eye(4), (len(frames), 1, 1))
+        scale[:, [0, 1, 2], [0, 1, 2]] = channels(pose_bone, 'scale')
+        basis[:, b] = skinning.quat_to_mat(
+            channels(pose_bone, 'rotation_quaternion')
+        ) @ scale
+        basis[:, b, :3, 3] = channels(pose_bone, 'location')
+
+    skin = skinning.skin_matrices(rest_mats, parents, basis)
+    return rest, tris, weights, skin
+
+# Deformation metrics of the rig's limbs for all `frames`.
+def limb_metrics(rig, frames):
+    results = {}
+    for armature, object, _, _ in rig.limbs:
+        rest, tris, weights, skin = limb_skinning_data(object, armature, frames)
+        positions = skinning.lbs(rest, weights, skin)
+        results[object.name] = skinning.metrics(positions, rest, tris)
+    return results
+
+# Deformation metrics of `n` two-loops variants, from the gap between their
+# joint loops, without creating any Blender data. `skin` are the skinning
+# matrices of the (shared) limb armature.
+def sweep_two_loops(skin, n, profile='HARD', segments=16):
+    results = {}
+    for gap in np.linspace(0.005, 0.1, n):
+        verts, faces = cylinder_zcuts(segments, radius=0.1,
+                                      zcuts=(0.2 - gap / 2, gap, 0.2 - gap / 2))
+        verts = verts.astype(np.float64)
+        tris = np.concatenate((faces[:, [0, 1, 2]], faces[:, [0, 2, 3]]))
+        weights = np.stack(shared.joint_weights(verts[:, 2],
+            joint=(0.2 - gap / 2, 0.2 + gap / 2), profile=profile,
+            width=0.2 - gap / 2,
+        ), axis=1)
+        positions = skinning.lbs(verts, weights, skin)
+        results[f'two_loops gap={gap:.4f}'] = skinning.metrics(positions,
+                                                               verts, tris)
+    return results
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', default='HARD',
+                        choices=('HARD', 'LINEAR', 'SMOOTHSTEP'),
+                        help='weights falloff across the joint')
+    parser.add_argument('--metrics', action='store_true',
+                        help='report volume loss & edge length distortion')
+    parser.add_argument('--sweep', type=int, default=0, metavar='N',
+                        help='compare N two-loops variants at the bend')
+    parser.add_argument('--glb', type=Path, metavar='PATH',
+                        help='export the skinned limbs to a glTF binary file')
+    args = parser.parse_args(shared.argv())
+
     shared.delete_data()
     C.scene.frame_current = 1
     C.scene.frame_end = 100
-    limb1 = add_limb_one_loop()
-    limb2 = add_limb_two_loops()
+    rig = LimbRig()
+    limb1 = add_limb_one_loop(rig, args.profile)
+    limb2 = add_limb_two_loops(rig, args.profile)
     limb2.location.x += 0.4
-    limb3 = add_limb_one_triangle()
+    limb3 = add_limb_one_triangle(rig, args.profile)
     limb3.location.x += 0.8
+    rig.build()
+
+    frames = np.arange(C.scene.frame_start, C.scene.frame_end + 1)
+    if args.metrics:
+        skinning.report(limb_metrics(rig, frames), frames)
+    if args.sweep:
+        armature, object, _, _ = rig.limbs[0]
+        skin = limb_skinning_data(object, armature, frames)[3]
+        results = sweep_two_loops(skin, args.sweep, args.profile)
+        bent = list(frames).index(50)
+        results = dict(sorted(results.items(),
+                              key=lambda r: abs(r[1]['volume_loss'][bent])))
+        skinning.report({ name: { k: v[bent:bent + 1] for k, v in m.items() }
+                          for name, m in results.items() }, frames[bent:])
+    if args.glb:
+        shared.export_glb_objects(args.glb,
+                                  [object for _, object, _, _ in rig.limbs])
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+
+# Render an animation with several background Blender processes:
+#   ./render.py SCENE [--frames 1-180] [--workers N] [--engine CYCLES]
+# SCENE is a .blend file, or a BPY script (e.g. 01) built once with run.py.
+# The frames missing from DIR/frames/ are split into chunks, rendered by N
+# workers with cpu_count / N threads each (to avoid oversubscription), and
+# written as frame_0001.png, ... Frames already rendered are skipped, so an
+# interrupted render resumes where it stopped.
+# With --cache DIR, every frame is rendered through a cache instead: workers
+# hash the evaluated state of each frame (shared.frame_hash()) and copy the
+# image cached under that hash when there is one, so that after a change only
+# the frames it affects are rendered again (and identical frames, such as the
+# end of a settled animation, are rendered once).
+
+import sys, os, time, math, shutil, argparse, subprocess, threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = Path(__file__).resolve().parent
+
+def frame_path(out: Path, frame: int) -> Path:
+    return out / f'frame_{frame:04d}.png'
+
+def parse_frames(spec: str) -> list[int]:
+    frames = []
+    for part in spec.split(','):
+        start, _, end = part.partition('-')
+        frames += range(int(start), int(end or start) + 1)
+    return frames
+
+# Worker, executed inside Blender: render `frames` of the current scene.
+# Frames are written to a temporary file first, so that a crash never leaves
+# a partial frame behind. With a `cache` directory, frames are looked up by
+# hash first, and each one is reported on stdout as "CACHE HIT|MISS frame".
+def worker(frames: list[int], out: Path, engine: str, threads: int,
+           cache: Path | None = None) -> None:
+    import bpy
+    sys.path.append(str(HERE))
+    import shared
+    scene = bpy.context.scene
+    scene.render.engine = engine
+    if engine == 'CYCLES':
+        scene.cycles.device = 'CPU'
+    scene.render.threads_mode = 'FIXED'
+    scene.render.threads = threads
+    scene.render.image_settings.file_format = 'PNG'
+
+    # cache keys must not depend on the worker's thread settings, which
+    # change with --workers, --threads and the machine's cpu count
+    if cache is not None and frames:
+        scene.frame_set(frames[0])
+        keys = []
+        for mode, count in (('FIXED', threads), ('FIXED', threads + 1),
+                            ('AUTO', 0)):
+            scene.render.threads_mode = mode
+            if mode == 'FIXED':
+                scene.render.threads = count
+            keys.append(shared.frame_hash(scene,
+                                          bpy.context.evaluated_depsgraph_get()))
+        scene.render.threads_mode = 'FIXED'
+        scene.render.threads = threads
+        if len(set(keys)) != 1:
+            raise RuntimeError('cache keys depend on the thread settings')
+
+    for frame in frames:
+        scene.frame_set(frame)
+        tmp = out / f'.frame_{frame:04d}.{os.getpid()}.png'
+        cached = None
+        if cache is not None:
+            key = shared.frame_hash(scene, bpy.context.evaluated_depsgraph_get())
+            cached = cache / f'{key}.png'
+            if cached.exists():
+                shutil.copyfile(cached, tmp)
+                os.replace(tmp, frame_path(out, frame))
+                print(f'CACHE HIT {frame}', flush=True)
+                continue
+        scene.render.filepath = str(tmp)
+        bpy.ops.render.render(write_still=True)
+        if cached is not None:
+            # another worker may store the same hash concurrently
+            cached_tmp = cache / f'.{cached.name}.{os.getpid()}'
+            shutil.copyfile(tmp, cached_tmp)
+            os.replace(cached_tmp, cached)
+            print(f'CACHE MISS {frame}', flush=True)
+        os.replace(tmp, frame_path(out, frame))
+
+# Compact ranges of frames, e.g. "1-20, 31, 40-45".
+def format_ranges(frames: list[int]) -> str:
+    ranges = []
+    for frame in sorted(frames):
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return ', '.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+# Build the .blend file of a BPY script with run.py.
+def build(blender: str, script: str, out: Path) -> Path:
+    subprocess.run([blender, '--background', '--factory-startup',
+                    '--python', str(HERE / 'run.py'), '--',
+                    script, '--out', str(out)], check=True)
+    return next(out.glob(f'{Path(script).stem}*.blend'))
+
+# Frame range of a .blend file's scene.
+def frame_range(blender: str, blend: Path) -> list[int]:
+    expr = ('import bpy; s = bpy.context.scene; '
+            'print("FRAMES", s.frame_start, s.frame_end)')
+    result = subprocess.run(
+        [blender, '--background', str(blend), '--python-expr', expr],
+        check=True, capture_output=True, text=True,
+    )
+    line = next(l for l in result.stdout.splitlines() if l.startswith('FRAMES'))
+    _, start, end = line.split()
+    return list(range(int(start), int(end) + 1))
+
+def main(args: argparse.Namespace) -> None:
+    out = args.out.resolve()
+    frames_dir = out / 'frames'
+    frames_dir.mkdir(parents=True, exist_ok=True)
+
+    # scene, built or loaded once
+    if args.scene.endswith('.blend'):
+        blend = Path(args.scene).resolve()
+    else:
+        blend = build(args.blender, args.scene, out)
+    frames = parse_frames(args.frames) if args.frames \
+             else frame_range(args.blender, blend)
+
+    # resume: skip frames which already exist, unless the cache decides
+    if args.cache:
+        args.cache = args.cache.resolve()
+        args.cache.mkdir(parents=True, exist_ok=True)
+        todo = frames
+    else:
+        todo = [f for f in frames if not frame_path(frames_dir, f).exists()]
+        print(f'{len(frames) - len(todo)} frames already rendered, '
+              f'{len(todo)} to render')
+    if not todo:
+        return
+    chunk = args.chunk or max(1, math.ceil(len(todo) / (4 * args.workers)))
+    chunks = [todo[i:i + chunk] for i in range(0, len(todo), chunk)]
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.workers)
+
+    # workers: each pool thread drives one Blender process at a time
+    busy: dict[str, float] = {}
+    failed = []
+    cache_status: dict[str, list[int]] = { 'HIT': [], 'MISS': [] }
+    def render(frames: list[int]) -> None:
+        start = time.perf_counter()
+        command = [
+            args.blender, '--background', str(blend), '--threads', str(threads),
+            '--python', str(Path(__file__).resolve()), '--', '--worker',
+            '--frames', ','.join(map(str, frames)), '--out', str(frames_dir),
+            '--engine', args.engine, '--threads', str(threads),
+        ]
+        if args.cache:
+            command += ['--cache', str(args.cache)]
+        result = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        for line in result.stdout.splitlines():
+            if line.startswith('CACHE '):
+                _, status, frame = line.split()
+                cache_status[status].append(int(frame))
+        name = threading.current_thread().name
+        busy[name] = busy.get(name, 0.0) + time.perf_counter() - start
+        if result.returncode != 0:
+            failed.append(frames)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        list(pool.map(render, chunks))
+    wall = time.perf_counter() - start
+
+    # reassembly: check the sequence, optionally encode it
+    missing = [f for f in frames if not frame_path(frames_dir, f).exists()]
+    if not missing and args.video:
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
+            print('ffmpeg not found, skipping video encoding')
+        else:
+            subprocess.run([ffmpeg, '-y', '-framerate', str(args.fps),
+                '-start_number', str(frames[0]),
+                '-i', str(frames_dir / 'frame_%04d.png'),
+                '-pix_fmt', 'yuv420p', str(args.video)], check=True)
+
+    # throughput summary
+    rendered = len(todo) - sum(
+        1 for f in todo if not frame_path(frames_dir, f).exists()
+    )
+    if args.cache:
+        hits, misses = cache_status['HIT'], cache_status['MISS']
+        print(f'cache: {len(hits)} hits, {len(misses)} misses')
+        if hits:
+            print(f'  hits: {format_ranges(hits)}')
+        if misses:
+            print(f'  rendered: {format_ranges(misses)}')
+        rendered = len(misses)
+    print(f'{rendered} frames in {wall:.1f}s: '
+          f'{rendered / wall * 60:.1f} frames/min, '
+          f'{args.workers} workers x {threads} threads')
+    for i, (name, seconds) in enumerate(sorted(busy.items())):
+        print(f'worker {i}: {seconds:.1f}s busy, {seconds / wall:.0%} utilization')
+    if missing:
+        print(f'{len(missing)} frames missing ({len(failed)} failed chunks), '
+              f'run again to resume')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    argv = sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv \
+           else sys.argv[1:]
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scene', nargs='?',
+                        help='.blend file or BPY script to build')
+    parser.add_argument('--frames', help='e.g. 1-100 or 1,5,10-20')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=0,
+                        help='threads per worker (default: cpu_count / workers)')
+    parser.add_argument('--chunk', type=int, default=0, help='frames per chunk')
+    parser.add_argument('--engine', default='CYCLES',
+                        help='CYCLES (CPU) or BLENDER_EEVEE where available')
+    parser.add_argument('--out', type=Path, default=Path('out/render'))
+    parser.add_argument('--video', type=Path, help='encode frames with ffmpeg')
+    parser.add_argument('--fps', type=int, default=24)
+    parser.add_argument('--cache', type=Path,
+                        help='render cache directory, keyed by frame state')
+    parser.add_argument('--blender', default=shutil.which('blender') or 'blender')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(parse_frames(args.frames), args.out, args.engine, args.threads,
+               args.cache)
+    else:
+        if args.scene is None:
+            parser.error('a scene is required')
+        main(args)
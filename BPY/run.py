@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+# Build several BPY scenes in a single Blender session, either with the bpy
+# module (https://pypi.org/project/bpy/) or in one background Blender:
+#   ./run.py [scripts...] [--out DIR]
+#   blender --background --factory-startup --python run.py -- [scripts...]
+# Each script's __main__ block is executed in sequence, after reloading the
+# factory settings (as --factory-startup does for a standalone build), then
+# the result is saved to DIR/<script>.blend. Scripts are given by name or
+# prefix (e.g. 01 02CubeOwl), all of them by default.
+# With --check, each build is compared with a standalone build of the script
+# in its own Blender process (`blender --factory-startup --python script`):
+# the hashes of their scene (shared.frame_hash() at the first frame, and the
+# frame range) must be equal.
+
+import sys, os, time, runpy, shutil, argparse, traceback, subprocess
+from pathlib import Path
+
+import bpy
+
+HERE = Path(__file__).resolve().parent
+SCENE_HASH = 'import run; print("SCENE", run.scene_hash())'
+
+def find_scripts(names: list[str]) -> list[Path]:
+    scripts = sorted(HERE.glob('[0-9][0-9]*.py'))
+    if not names:
+        return scripts
+    result = []
+    for name in names:
+        matches = [s for s in scripts if s.stem.startswith(Path(name).stem)]
+        if len(matches) != 1:
+            raise SystemExit(f'{name}: {len(matches)} matching scripts')
+        result += matches
+    return result
+
+# Run the __main__ block of `script`, then save the blend-file to `out`.
+# Returns the (build, save) durations in seconds.
+def run(script: Path, out: Path) -> tuple[float, float]:
+    import shared
+    # settings left by the previous script (scene, world, render...) must
+    # not leak into this one
+    bpy.ops.wm.read_factory_settings()
+    shared.delete_data()
+
+    argv = sys.argv
+    sys.argv = [str(script)] # scripts use their default arguments
+    try:
+        start = time.perf_counter()
+        runpy.run_path(str(script), run_name='__main__')
+        build = time.perf_counter() - start
+    finally:
+        sys.argv = argv
+
+    start = time.perf_counter()
+    bpy.ops.wm.save_as_mainfile(filepath=str(out / f'{script.stem}.blend'),
+                                copy=True)
+    return build, time.perf_counter() - start
+
+# Hash of what the current scene renders, see shared.frame_hash().
+def scene_hash() -> str:
+    import shared
+    scene = bpy.context.scene
+    scene.frame_set(scene.frame_start)
+    frame = shared.frame_hash(scene, bpy.context.evaluated_depsgraph_get())
+    return f'{frame}:{scene.frame_start}-{scene.frame_end}@{scene.render.fps}'
+
+# Scene hash of a standalone build of `script`, in a new Blender process.
+def standalone_hash(blender: str, script: Path) -> str:
+    result = subprocess.run(
+        [blender, '--background', '--factory-startup', '--python', str(script),
+         '--python-expr', f'import sys; sys.path.append("."); {SCENE_HASH}'],
+        cwd=HERE, capture_output=True, text=True, check=True,
+    )
+    line = next(l for l in result.stdout.splitlines() if l.startswith('SCENE '))
+    return line.split()[1]
+
+if __name__ == '__main__':
+    if '--' in sys.argv: # blender --python run.py -- ...
+        argv = sys.argv[sys.argv.index('--') + 1:]
+    elif Path(sys.argv[0]).name == Path(__file__).name: # python run.py ...
+        argv = sys.argv[1:]
+    else:
+        argv = []
+    parser = argparse.ArgumentParser()
+    parser.add_argument('scripts', nargs='*')
+    parser.add_argument('--out', type=Path, default=Path('out'))
+    parser.add_argument('--check', action='store_true',
+                        help='compare each build with a standalone build')
+    parser.add_argument('--blender',
+                        default=bpy.app.binary_path or shutil.which('blender'))
+    args = parser.parse_args(argv)
+
+    # scripts expect to be executed from their directory
+    out = args.out.resolve()
+    out.mkdir(parents=True, exist_ok=True)
+    os.chdir(HERE)
+    if '.' not in sys.path:
+        sys.path.append('.')
+
+    timings = {}
+    mismatches = []
+    for script in find_scripts(args.scripts):
+        try:
+            timings[script.stem] = run(script, out)
+            if args.check:
+                same = scene_hash() == standalone_hash(args.blender, script)
+                print(f"{script.stem}: {'same' if same else 'DIFFERENT'} "
+                      f"scene as a standalone build")
+                if not same:
+                    mismatches.append(script.stem)
+        except Exception:
+            traceback.print_exc()
+            timings[script.stem] = None
+
+    print(f"{'script':<20} {'build':>8} {'save':>8}")
+    for name, timing in timings.items():
+        if timing is None:
+            print(f"{name:<20} {'failed':>8}")
+        else:
+            print(f"{name:<20} {timing[0]:>7.2f}s {timing[1]:>7.2f}s")
+    total = sum(sum(t) for t in timings.values() if t)
+    print(f"{'total':<20} {total:>16.2f}s")
+
+    if None in timings.values() or mismatches:
+        sys.exit(1)
@@ -1,4 +1,7 @@
-from typing import Any, Callable
+from typing import Any, Callable, Sequence
+import sys, json, struct, hashlib
+from pathlib import Path
+import numpy as np
 import bpy, bmesh
 C = bpy.context
 D = bpy.data
@@ -7,10 +10,16 @@ D = bpy.data
 def delete_data() -> None:
     for prop_collection in (
         D.actions, D.armatures, D.cameras, D.lights, D.materials, D.meshes,
-        D.objects, D.collections, D.images
+        D.objects, D.collections, D.images, D.node_groups
     ):
         for item in prop_collection:
             prop_collection.remove(item)
+    material_registry.clear()
+
+# Arguments following '--' on the command line,
+# e.g. `blender --python script.py -- --shape 100 100`.
+def argv() -> list[str]:
+    return sys.argv[sys.argv.index('--') + 1:] if '--' in sys.argv else []
 
 # Create a new object from a bpy.ops.create_ function.
 def new_obj(bmesh_op: Callable, name: str, *args: Any, **kwargs: Any) -> bpy.types.Object:
@@ -21,10 +30,74 @@ def new_obj(bmesh_op: Callable, name: str, *args: Any, **kwargs: Any) -> bpy.typ
     bm.free()
     return D.objects.new(name, mesh)
 
+# Fill an empty mesh from vertex and face arrays with foreach_set(), without
+# the per-element Python work of Mesh.from_pydata(). All faces must have the
+# same number of vertices.
+def mesh_from_arrays(mesh: bpy.types.Mesh, verts: Any, faces: Any) -> None:
+    verts = np.asarray(verts, dtype=np.float32)
+    faces = np.asarray(faces, dtype=np.int32)
+    mesh.vertices.add(len(verts))
+    mesh.vertices.foreach_set('co', verts.ravel())
+    mesh.loops.add(faces.size)
+    mesh.loops.foreach_set('vertex_index', faces.ravel())
+    mesh.polygons.add(len(faces))
+    mesh.polygons.foreach_set('loop_start',
+        np.arange(0, faces.size, faces.shape[1], dtype=np.int32))
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set('loop_total',
+            np.full(len(faces), faces.shape[1], dtype=np.int32))
+    mesh.update(calc_edges=True)
+
+# Vertex coordinates of a mesh as a (n, 3) array.
+def mesh_coords(mesh: bpy.types.Mesh) -> np.ndarray:
+    co = np.empty(3 * len(mesh.vertices), dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    return co.reshape(-1, 3)
+
+# Weights of two bones sharing a joint, from the coordinates `t` of vertices
+# along the bones' axis. The joint spans [joint[0], joint[1]].
+# * HARD: 0/1 weights, the first bone up to joint[0], the second one from
+#   joint[1] (vertices on a single loop joint belong to both bones)
+# * LINEAR, SMOOTHSTEP: the first bone's weight falls off from 1 to 0 (and
+#   the second one's rises from 0 to 1) over the joint widened by `width`
+#   on both sides
+def joint_weights(
+    t: Any, joint: tuple[float, float], profile: str = 'HARD',
+    width: float = 0.0, eps: float = 1e-5,
+) -> tuple[np.ndarray, np.ndarray]:
+    t = np.asarray(t, dtype=np.float32)
+    start, end = joint
+    if profile == 'HARD':
+        return ((t <= start + eps).astype(np.float32),
+                (t >= end - eps).astype(np.float32))
+
+    start, end = start - width, end + width
+    x = np.clip((t - start) / max(end - start, eps), 0.0, 1.0)
+    if profile == 'SMOOTHSTEP':
+        x = x * x * (3.0 - 2.0 * x)
+    elif profile != 'LINEAR':
+        raise ValueError(f'unknown weight profile: {profile}')
+    return 1.0 - x, x
+
+# Write per-vertex weights (rounded to `decimals`) to a vertex group, with one
+# VertexGroup.add() call per distinct weight. Zero weights are skipped.
+def vertex_group_set(vg: bpy.types.VertexGroup, weights: Any,
+                     decimals: int = 4) -> None:
+    weights = np.round(np.asarray(weights, dtype=np.float32), decimals)
+    values, inverse = np.unique(weights, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    batches = np.split(order, np.cumsum(np.bincount(inverse))[:-1])
+    for value, indices in zip(values, batches):
+        if value > 0.0:
+            vg.add(indices.tolist(), float(value), 'REPLACE')
+
 # Append an object's data to a bmesh object.
 def bm_absorb_obj(bm: bmesh.types.BMesh, obj: bpy.types.Object) -> None:
     bm.from_mesh(obj.data)
     for m in obj.data.materials:
+        if m.users > 1: # shared through the material registry
+            continue
+        material_forget(m)
         D.materials.remove(m)
     D.meshes.remove(obj.data) # removes both the mesh and object from D
 
@@ -41,3 +114,516 @@ def bm_geom_split(geom: list) -> dict[str, list]:
     result['f'] = result['faces']
     return result
 
+
+# Materials sharing the same node graph and parameters, indexed by hash. Each
+# unique material costs a separate shader compilation in EEVEE. Duplicates
+# are counted whether or not they would have been assigned to an object (an
+# orphan material is never compiled), so `merged` is not a compile count.
+material_registry: dict[str, bpy.types.Material] = {}
+material_stats = { 'merged': 0 }
+
+# Convert an RNA property value to a hashable value.
+def rna_value(value: Any) -> Any:
+    if isinstance(value, bpy.types.ID):
+        return value.name_full
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    try:
+        return tuple(value)
+    except TypeError:
+        return None
+
+# Feed a node tree's nodes, node properties, input values and links to
+# `feed`. Node names are part of the hash, datablock names are not.
+def node_tree_feed(tree: bpy.types.NodeTree, feed: Callable[..., None]) -> None:
+    node_props = set(p.identifier for p in bpy.types.ShaderNode.bl_rna.properties)
+    for node in sorted(tree.nodes, key=lambda n: n.name):
+        feed(node.name, node.bl_idname)
+        for prop in node.bl_rna.properties:
+            if prop.identifier in node_props or prop.type == 'COLLECTION':
+                continue
+            value = getattr(node, prop.identifier)
+            if prop.type == 'POINTER' and not isinstance(value, bpy.types.ID):
+                continue
+            feed(prop.identifier, rna_value(value))
+        for socket in node.inputs:
+            if hasattr(socket, 'default_value'):
+                feed(socket.identifier, rna_value(socket.default_value))
+    for link in sorted(tree.links, key=lambda l: (
+        l.to_node.name, l.to_socket.identifier
+    )):
+        feed(link.from_node.name, link.from_socket.identifier,
+             link.to_node.name, link.to_socket.identifier)
+
+# Hash a material's settings and node tree.
+def material_hash(material: bpy.types.Material) -> str:
+    h = hashlib.sha1()
+    def feed(*values: Any) -> None:
+        h.update(repr(values).encode())
+
+    feed(material.use_nodes, tuple(material.diffuse_color),
+         getattr(material, 'blend_method', None))
+    if material.node_tree:
+        node_tree_feed(material.node_tree, feed)
+    return h.hexdigest()
+
+# Return a registered material identical to `material`, in which case
+# `material` is removed, otherwise register and return `material`.
+def material_dedup(material: bpy.types.Material) -> bpy.types.Material:
+    key = material_hash(material)
+    existing = material_registry.get(key)
+    if existing is not None and existing != material:
+        D.materials.remove(material)
+        material_stats['merged'] += 1
+        return existing
+    material_registry[key] = material
+    return material
+
+# Remove `material` from the registry, e.g. before deleting it.
+def material_forget(material: bpy.types.Material) -> None:
+    for key, m in list(material_registry.items()):
+        if m == material:
+            del material_registry[key]
+
+def material_report() -> None:
+    print(f"materials: {len(material_registry)} unique, "
+          f"{material_stats['merged']} duplicate materials merged")
+
+# Insert keyframes in bulk: F-curves are created directly and filled with
+# foreach_set() instead of going through keyframe_insert() for each key. The
+# resulting curves are identical (same action, groups, auto clamped handles).
+# * owners: objects, or pose bones
+# * frames: (n_keys,) or (n_owners, n_keys) array
+# * values: (n_owners, n_keys, n_channels) array
+def keyframes_insert_bulk(
+    owners: Sequence[Any], data_path: str, frames: Any, values: Any,
+    interpolation: str = 'BEZIER',
+) -> list[bpy.types.FCurve]:
+    values = np.asarray(values, dtype=np.float32)
+    interpolation_value = bpy.types.Keyframe.bl_rna.properties['interpolation'] \
+                          .enum_items[interpolation].value
+    frames = np.broadcast_to(np.asarray(frames, dtype=np.float32),
+                             values.shape[:2])
+    fcurves = []
+    for owner, owner_frames, owner_values in zip(owners, frames, values):
+        id = owner.id_data
+        path = owner.path_from_id(data_path)
+        group = owner.name if isinstance(owner, bpy.types.PoseBone) \
+                else 'Object Transforms'
+        anim_data = id.animation_data or id.animation_data_create()
+        if anim_data.action is None:
+            anim_data.action = D.actions.new(f'{id.name}Action')
+        action = anim_data.action
+
+        for channel in range(values.shape[2]):
+            fcurve = action.fcurves.find(path, index=channel) \
+                  or action.fcurves.new(path, index=channel, action_group=group)
+            points = fcurve.keyframe_points
+            existing = len(points)
+            co = np.empty(2 * existing, dtype=np.float32)
+            points.foreach_get('co', co)
+            co = np.concatenate((co, np.column_stack(
+                (owner_frames, owner_values[:, channel])
+            ).ravel()))
+            points.add(len(owner_frames))
+            points.foreach_set('co', co)
+            if interpolation != 'BEZIER':
+                # only the added keyframes (appended, until update() sorts)
+                modes = np.empty(len(points), dtype=np.int32)
+                points.foreach_get('interpolation', modes)
+                modes[existing:] = interpolation_value
+                points.foreach_set('interpolation', modes)
+            fcurve.update() # sort keyframes & compute handles
+            fcurves.append(fcurve)
+    return fcurves
+
+
+# Values of the non-pointer properties of an RNA struct, e.g. render settings.
+def rna_props(struct: Any, exclude: Sequence[str] = ()) -> tuple:
+    return tuple(
+        (prop.identifier, rna_value(getattr(struct, prop.identifier)))
+        for prop in struct.bl_rna.properties
+        if prop.type not in ('POINTER', 'COLLECTION')
+        and prop.identifier not in ('rna_type', *exclude)
+    )
+
+# Hash of an evaluated mesh: vertex positions and topology.
+def mesh_hash(mesh: bpy.types.Mesh) -> str:
+    h = hashlib.sha1()
+    co = np.empty(3 * len(mesh.vertices), dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    loops = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loops)
+    sizes = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('loop_total', sizes)
+    for array in (co, loops, sizes):
+        h.update(array.tobytes())
+    return h.hexdigest()
+
+# Hash the evaluated state of the current frame, i.e. everything a render of
+# it depends on in these scenes: render & engine settings, world, camera,
+# and for every visible object instance its transform, evaluated mesh (or
+# data settings for lights & cameras) and materials. Two frames with the same
+# hash render the same image, whatever their frame number.
+def frame_hash(scene: bpy.types.Scene,
+               depsgraph: bpy.types.Depsgraph) -> str:
+    h = hashlib.sha1()
+    def feed(*values: Any) -> None:
+        h.update(repr(values).encode())
+
+    # output path & threading only depend on how and where a frame is
+    # rendered (e.g. render.py's --workers), not on the image
+    feed(rna_props(scene.render, exclude=('filepath', 'frame_map_old',
+                                          'frame_map_new', 'threads',
+                                          'threads_mode')))
+    feed(rna_props(scene.render.image_settings))
+    for engine in ('cycles', 'eevee'):
+        if hasattr(scene, engine):
+            feed(rna_props(getattr(scene, engine)))
+    if scene.world and scene.world.node_tree:
+        node_tree_feed(scene.world.node_tree, feed)
+    feed(scene.camera.name if scene.camera else None)
+
+    # data hashes are shared by the instances of a datablock
+    data_hashes: dict[int, str] = {}
+    material_hashes: dict[str, str] = {}
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.hide_render or obj.type in ('ARMATURE', 'EMPTY'):
+            continue
+        feed(obj.type, tuple(map(tuple, instance.matrix_world)))
+        data = obj.data
+        key = data.as_pointer() if data else 0
+        if key not in data_hashes:
+            if isinstance(data, bpy.types.Mesh):
+                data_hashes[key] = mesh_hash(data)
+            elif data is not None:
+                data_hashes[key] = repr(rna_props(data))
+            else:
+                data_hashes[key] = ''
+        feed(data_hashes[key])
+        for slot in obj.material_slots:
+            material = slot.material
+            if material is None:
+                continue
+            if material.name_full not in material_hashes:
+                material_hashes[material.name_full] = material_hash(material)
+            feed(material_hashes[material.name_full])
+    return h.hexdigest()
+
+
+# Weights (vertices, len(names)) of the vertex groups `names` of `obj`, 0 for
+# missing groups (bpy has no bulk accessor for vertex group weights).
+def vertex_group_weights(obj: bpy.types.Object,
+                         names: Sequence[str]) -> np.ndarray:
+    weights = np.zeros((len(obj.data.vertices), len(names)), dtype=np.float32)
+    columns = { vg.index: names.index(vg.name)
+                for vg in obj.vertex_groups if vg.name in names }
+    for vert in obj.data.vertices:
+        for g in vert.groups:
+            if g.group in columns:
+                weights[vert.index, columns[g.group]] = g.weight
+    return weights
+
+# Triangulated arrays of a mesh, with the corners sharing all their attributes
+# welded into vertices, as glTF expects:
+# * positions, normals: (vertices, 3) float32, normals per corner (i.e.
+#   smooth/flat shading and sharp edges are kept)
+# * uvs: (vertices, 2) float32 of the active UV map, if any
+# * weights: (vertices, bones) float32, from the per mesh vertex `weights`
+#   (cf. joint_weights() or vertex_group_weights()), if given
+# * indices: (triangles, 3) int32, material_index: (triangles,) int32
+def mesh_arrays(mesh: bpy.types.Mesh,
+                weights: np.ndarray | None = None) -> dict[str, np.ndarray]:
+    mesh.calc_loop_triangles()
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', loop_verts)
+    normals = np.empty(3 * len(mesh.loops), dtype=np.float32)
+    if hasattr(mesh, 'corner_normals'): # blender >= 4.1
+        mesh.corner_normals.foreach_get('vector', normals)
+    else:
+        mesh.calc_normals_split()
+        mesh.loops.foreach_get('normal', normals)
+
+    columns = { 'positions': mesh_coords(mesh)[loop_verts],
+                'normals': normals.reshape(-1, 3) }
+    if mesh.uv_layers.active:
+        uvs = np.empty(2 * len(mesh.loops), dtype=np.float32)
+        mesh.uv_layers.active.data.foreach_get('uv', uvs)
+        columns['uvs'] = uvs.reshape(-1, 2)
+    if weights is not None:
+        columns['weights'] = np.asarray(weights, dtype=np.float32)[loop_verts]
+
+    # weld: unique rows of all the corner attributes (+ 0.0 turns -0.0 to 0.0)
+    corners = np.ascontiguousarray(np.concatenate(
+        list(columns.values()), axis=1, dtype=np.float32
+    )) + np.float32(0.0)
+    keys = corners.view(np.dtype((np.void, corners.shape[1] * 4))).ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+    result = {}
+    start = 0
+    for name, column in columns.items():
+        result[name] = corners[first, start:start + column.shape[1]]
+        start += column.shape[1]
+    tris = np.empty(3 * len(mesh.loop_triangles), dtype=np.int32)
+    mesh.loop_triangles.foreach_get('loops', tris)
+    result['indices'] = inverse.ravel()[tris].reshape(-1, 3).astype(np.int32)
+    result['material_index'] = np.empty(len(mesh.loop_triangles), dtype=np.int32)
+    mesh.loop_triangles.foreach_get('material_index', result['material_index'])
+    return result
+
+# glTF 2.0 binary (GLB) export of NumPy arrays, without the glTF add-on.
+# ref: https://registry.khronos.org/glTF/specs/2.0/glTF-2.0.html
+# Blender is Z-up, glTF is Y-up: (x, y, z) becomes (x, z, -y).
+GLTF_AXES = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, -1, 0, 0], [0, 0, 0, 1]],
+                     dtype=np.float64)
+GLTF_COMPONENTS = { np.dtype(np.int8): 5120, np.dtype(np.uint8): 5121,
+                    np.dtype(np.uint16): 5123, np.dtype(np.uint32): 5125,
+                    np.dtype(np.float32): 5126 }
+GLTF_TYPES = { 1: 'SCALAR', 2: 'VEC2', 3: 'VEC3', 4: 'VEC4', 16: 'MAT4' }
+
+# Write a GLB file of nodes, from arrays only (no bpy data involved):
+# * nodes: dicts of 'name', 'matrix' (4, 4) world matrix, 'mesh' (cf.
+#   mesh_arrays()), 'materials' (material index of each material_index, or
+#   -1), and 'skin' (skin index, the mesh then needs 'weights')
+# * materials: dicts of 'name', 'color' RGBA, 'metallic', 'roughness',
+#   'image' (PNG bytes or None), 'nearest' (nearest texture filtering)
+# * skins: dicts of 'name', 'matrix' (4, 4) armature world matrix, 'bones'
+#   names, 'parents' (index of each bone's parent, -1 for roots; parents
+#   come first), 'rest' (bones, 4, 4) armature space rest matrices
+# All matrices and coordinates are Blender's (Z-up).
+def export_glb(path: str | Path, nodes: Sequence[dict],
+               materials: Sequence[dict] = (),
+               skins: Sequence[dict] = ()) -> None:
+    gltf: dict[str, Any] = {
+        'asset': { 'version': '2.0', 'generator': 'BPY shared.py' },
+        'scene': 0, 'scenes': [{ 'nodes': [] }], 'nodes': [],
+    }
+    def add(key: str, entry: dict) -> int:
+        gltf.setdefault(key, []).append(entry)
+        return len(gltf[key]) - 1
+
+    # binary chunk: each buffer view is 4 bytes aligned
+    chunks: list[bytes] = []
+    offset = 0
+    def view(data: bytes, target: int | None = None) -> int:
+        nonlocal offset
+        entry = { 'buffer': 0, 'byteOffset': offset, 'byteLength': len(data) }
+        if target:
+            entry['target'] = target
+        chunks.append(data + bytes(-len(data) % 4))
+        offset += len(chunks[-1])
+        return add('bufferViews', entry)
+    def accessor(array: np.ndarray, target: int | None = None,
+                 bounds: bool = False) -> int:
+        array = np.ascontiguousarray(array).reshape(len(array), -1)
+        entry = {
+            'bufferView': view(array.tobytes(), target),
+            'componentType': GLTF_COMPONENTS[array.dtype],
+            'count': len(array), 'type': GLTF_TYPES[array.shape[1]],
+        }
+        if bounds:
+            entry['min'] = array.min(axis=0).tolist()
+            entry['max'] = array.max(axis=0).tolist()
+        return add('accessors', entry)
+    def yup(matrix: np.ndarray) -> np.ndarray:
+        return GLTF_AXES @ matrix @ GLTF_AXES.T
+    def column_major(matrix: np.ndarray) -> list[float]:
+        return matrix.T.ravel().tolist()
+    axes = GLTF_AXES[:3, :3].T.astype(np.float32)
+
+    # materials & textures
+    for material in materials:
+        pbr = {
+            'baseColorFactor': list(material.get('color', (0.8, 0.8, 0.8, 1.0))),
+            'metallicFactor': material.get('metallic', 0.0),
+            'roughnessFactor': material.get('roughness', 0.5),
+        }
+        if material.get('image'):
+            filter = 9728 if material.get('nearest') else 9729 # NEAREST/LINEAR
+            pbr['baseColorTexture'] = { 'index': add('textures', {
+                'sampler': add('samplers', { 'magFilter': filter,
+                                             'minFilter': filter }),
+                'source': add('images', { 'bufferView': view(material['image']),
+                                          'mimeType': 'image/png' }),
+            })}
+        add('materials', { 'name': material['name'],
+                           'pbrMetallicRoughness': pbr })
+
+    # skins: the joint nodes of each armature are shared by its meshes
+    joint_nodes: dict[int, list[int]] = {}
+    joint_worlds: dict[int, np.ndarray] = {}
+    for s, skin in enumerate(skins):
+        rest = np.asarray(skin['rest'], dtype=np.float64)
+        world = np.asarray(skin['matrix'], dtype=np.float64) @ rest
+        joint_worlds[s] = np.array([yup(m) for m in world])
+        joint_nodes[s] = []
+        for b, (name, parent) in enumerate(zip(skin['bones'], skin['parents'])):
+            local = world[b] if parent < 0 \
+                    else np.linalg.inv(rest[parent]) @ rest[b]
+            node = add('nodes', { 'name': name,
+                                  'matrix': column_major(yup(local)) })
+            joint_nodes[s].append(node)
+            if parent < 0:
+                gltf['scenes'][0]['nodes'].append(node)
+            else:
+                parent_node = gltf['nodes'][joint_nodes[s][parent]]
+                parent_node.setdefault('children', []).append(node)
+
+    # meshes
+    for node in nodes:
+        entry: dict[str, Any] = { 'name': node['name'] }
+        matrix = yup(np.asarray(node.get('matrix', np.eye(4)), dtype=np.float64))
+        mesh = node.get('mesh')
+        if mesh is not None:
+            attributes = {
+                'POSITION': accessor(mesh['positions'] @ axes, 34962, True),
+                'NORMAL': accessor(mesh['normals'] @ axes, 34962),
+            }
+            if 'uvs' in mesh: # glTF's v axis points down
+                uvs = mesh['uvs'] * np.float32((1, -1)) + np.float32((0, 1))
+                attributes['TEXCOORD_0'] = accessor(uvs, 34962)
+            if node.get('skin') is not None:
+                # the 4 largest weights of each vertex, normalized; vertices
+                # without weights follow the first joint. Unused slots (zero
+                # weight, e.g. the padding of skins with less than 4 joints)
+                # point to joint 0, as out of range indices are invalid.
+                weights = np.pad(mesh['weights'],
+                                 ((0, 0), (0, max(0, 4 - mesh['weights'].shape[1]))))
+                joints = np.argsort(-weights, axis=1, kind='stable')[:, :4]
+                weights = np.take_along_axis(weights, joints, axis=1)
+                joints = np.where(weights > 0, joints, 0)
+                total = weights.sum(axis=1, keepdims=True)
+                weights = np.where(total > 0, weights / np.where(total > 0, total, 1),
+                                   np.float32((1, 0, 0, 0)))
+                attributes['JOINTS_0'] = accessor(joints.astype(np.uint16), 34962)
+                attributes['WEIGHTS_0'] = accessor(weights.astype(np.float32), 34962)
+
+            index_type = np.uint16 if len(mesh['positions']) < 65536 else np.uint32
+            primitives = []
+            for m in np.unique(mesh['material_index']):
+                tris = mesh['indices'][mesh['material_index'] == m]
+                primitive = {
+                    'attributes': attributes,
+                    'indices': accessor(tris.ravel().astype(index_type), 34963),
+                }
+                slots = node.get('materials', [])
+                if m < len(slots) and slots[m] >= 0:
+                    primitive['material'] = int(slots[m])
+                primitives.append(primitive)
+            entry['mesh'] = add('meshes', { 'name': node['name'],
+                                            'primitives': primitives })
+
+        if node.get('skin') is not None:
+            # skinned meshes are placed by their joints: the mesh's world
+            # matrix goes to the inverse bind matrices
+            s = node['skin']
+            entry['skin'] = add('skins', {
+                'name': skins[s]['name'], 'joints': joint_nodes[s],
+                'inverseBindMatrices': accessor(np.array([
+                    column_major(np.linalg.inv(joint) @ matrix)
+                    for joint in joint_worlds[s]
+                ], dtype=np.float32)),
+            })
+        else:
+            entry['matrix'] = column_major(matrix)
+        gltf['scenes'][0]['nodes'].append(add('nodes', entry))
+
+    # GLB container: header, JSON chunk (space padded), BIN chunk
+    binary = b''.join(chunks)
+    if binary:
+        gltf['buffers'] = [{ 'byteLength': len(binary) }]
+    text = json.dumps(gltf, separators=(',', ':')).encode()
+    text += b' ' * (-len(text) % 4)
+    data = struct.pack('<I4s', len(text), b'JSON') + text
+    if binary:
+        data += struct.pack('<I4s', len(binary), b'BIN\0') + binary
+    with open(path, 'wb') as file:
+        file.write(struct.pack('<III', 0x46546C67, 2, 12 + len(data)) + data)
+
+# PNG bytes of an image: its packed data, its file, or packed on the fly.
+def image_png(image: bpy.types.Image) -> bytes:
+    if image.packed_file is None:
+        path = Path(bpy.path.abspath(image.filepath))
+        if image.file_format == 'PNG' and path.is_file():
+            return path.read_bytes()
+        image.pack()
+    return bytes(image.packed_file.data)
+
+# glTF material of a Blender material: the Principled BSDF's base color,
+# metallic and roughness, and the image texture linked to its base color.
+def gltf_material(material: bpy.types.Material) -> dict:
+    result = { 'name': material.name, 'color': tuple(material.diffuse_color),
+               'metallic': material.metallic, 'roughness': material.roughness,
+               'image': None, 'nearest': False }
+    nodes = material.node_tree.nodes if material.use_nodes else ()
+    bsdf = next((n for n in nodes if n.type == 'BSDF_PRINCIPLED'), None)
+    if bsdf is None:
+        return result
+    color = bsdf.inputs['Base Color']
+    result['color'] = tuple(color.default_value)
+    result['metallic'] = bsdf.inputs['Metallic'].default_value
+    result['roughness'] = bsdf.inputs['Roughness'].default_value
+    if color.is_linked and color.links[0].from_node.type == 'TEX_IMAGE':
+        texture = color.links[0].from_node
+        if texture.image is not None:
+            result['image'] = image_png(texture.image)
+            result['nearest'] = texture.interpolation == 'Closest'
+            # the socket's value is ignored when linked, and glTF multiplies
+            # the texture by baseColorFactor
+            result['color'] = (1.0, 1.0, 1.0, 1.0)
+    return result
+
+# Bones of an armature, as export_glb() skins.
+def gltf_skin(armature: bpy.types.Object) -> dict:
+    bones = armature.data.bones
+    return {
+        'name': armature.name, 'matrix': np.array(armature.matrix_world),
+        'bones': [bone.name for bone in bones],
+        'parents': [bones.find(b.parent.name) if b.parent else -1 for b in bones],
+        'rest': np.array([bone.matrix_local for bone in bones]),
+    }
+
+# Export mesh objects to a GLB file. Meshes are evaluated (modifiers applied),
+# except the ones deformed by an armature modifier: their rest mesh is
+# exported with the armature's bones as a skin, weighted by the vertex groups
+# of the bones (modifiers other than the armature are ignored then).
+def export_glb_objects(path: str | Path,
+                       objects: Sequence[bpy.types.Object]) -> None:
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    nodes: list[dict] = []
+    materials: list[dict] = []
+    skins: list[dict] = []
+    material_index: dict[str, int] = {}
+    skin_index: dict[str, int] = {}
+    for obj in objects:
+        if obj.type != 'MESH':
+            continue
+        node = { 'name': obj.name, 'matrix': np.array(obj.matrix_world),
+                 'materials': [] }
+        armature = next((m.object for m in obj.modifiers
+                         if m.type == 'ARMATURE' and m.object), None)
+        if armature is not None:
+            if armature.name not in skin_index:
+                skin_index[armature.name] = len(skins)
+                skins.append(gltf_skin(armature))
+            node['skin'] = skin_index[armature.name]
+            node['mesh'] = mesh_arrays(obj.data, vertex_group_weights(
+                obj, skins[node['skin']]['bones']
+            ))
+        else:
+            evaluated = obj.evaluated_get(depsgraph)
+            node['mesh'] = mesh_arrays(evaluated.to_mesh())
+            evaluated.to_mesh_clear()
+
+        for slot in obj.material_slots:
+            material = slot.material
+            if material is not None and material.name_full not in material_index:
+                material_index[material.name_full] = len(materials)
+                materials.append(gltf_material(material))
+            node['materials'].append(
+                material_index[material.name_full] if material else -1
+            )
+        nodes.append(node)
+    export_glb(path, nodes, materials, skins)
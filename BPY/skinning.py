@@ -0,0 +1,132 @@
+# Linear blend skinning and deformation metrics with NumPy, without bpy: the
+# inputs can be extracted from Blender once, or generated from arrays, and
+# then evaluated for all frames at once.
+
+import numpy as np
+
+# Rotation matrices (..., 4, 4) of quaternions (..., 4) stored as (w, x, y, z).
+def quat_to_mat(q: np.ndarray) -> np.ndarray:
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    m = np.zeros(q.shape[:-1] + (4, 4))
+    m[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    m[..., 0, 1] = 2 * (x * y - z * w)
+    m[..., 0, 2] = 2 * (x * z + y * w)
+    m[..., 1, 0] = 2 * (x * y + z * w)
+    m[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    m[..., 1, 2] = 2 * (y * z - x * w)
+    m[..., 2, 0] = 2 * (x * z - y * w)
+    m[..., 2, 1] = 2 * (y * z + x * w)
+    m[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    m[..., 3, 3] = 1
+    return m
+
+# Skinning matrices (frames, bones, 4, 4), i.e. pose @ rest^-1 for each bone.
+# * rest: (bones, 4, 4) armature space rest matrices (Bone.matrix_local)
+# * parents: index of each bone's parent, -1 for roots; parents come first
+# * basis: (frames, bones, 4, 4) pose matrices relative to the rest pose
+#   (PoseBone.matrix_basis)
+def skin_matrices(rest: np.ndarray, parents: list[int],
+                  basis: np.ndarray) -> np.ndarray:
+    rest_inv = np.linalg.inv(rest)
+    pose = np.empty_like(basis)
+    for b, parent in enumerate(parents):
+        if parent < 0:
+            pose[:, b] = rest[b] @ basis[:, b]
+        else:
+            offset = rest_inv[parent] @ rest[b]
+            pose[:, b] = pose[:, parent] @ offset @ basis[:, b]
+    return pose @ rest_inv
+
+# Skinned positions (frames, verts, 3) of the rest positions (verts, 3).
+# Weights (verts, bones) are normalized like the armature modifier does,
+# vertices without weights keep their rest position.
+def lbs(rest: np.ndarray, weights: np.ndarray,
+        skin: np.ndarray) -> np.ndarray:
+    total = weights.sum(axis=1)
+    weights = weights / np.where(total > 0, total, 1)[:, None]
+    rest_h = np.concatenate((rest, np.ones((len(rest), 1))), axis=1)
+    # (frames, bones, verts, 3) positions per bone, blended over bones
+    per_bone = np.einsum('fbij,vj->fbvi', skin[..., :3, :], rest_h)
+    skinned = np.einsum('vb,fbvi->fvi', weights, per_bone)
+    return np.where((total > 0)[None, :, None], skinned, rest[None])
+
+# Unique undirected edges (edges, 2) of triangles (tris, 3).
+def tri_edges(tris: np.ndarray) -> np.ndarray:
+    edges = np.concatenate((tris[:, [0, 1]], tris[:, [1, 2]], tris[:, [2, 0]]))
+    return np.unique(np.sort(edges, axis=1), axis=0)
+
+# Caps closing the holes of an open surface (e.g. the ends of a limb): each
+# boundary edge (a, b) becomes a triangle (b, a, centroid of its loop).
+# Returns the boundary edges (n, 2) and the loop label of each edge (n,).
+def boundary_caps(tris: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    directed = np.concatenate((tris[:, [0, 1]], tris[:, [1, 2]],
+                               tris[:, [2, 0]]))
+    _, inverse, counts = np.unique(np.sort(directed, axis=1), axis=0,
+                                   return_inverse=True, return_counts=True)
+    boundary = directed[counts[inverse.ravel()] == 1]
+
+    # connected components of the boundary vertices, by label propagation
+    labels = np.arange(tris.max() + 1)
+    while True:
+        new = labels.copy()
+        np.minimum.at(new, boundary[:, 0], labels[boundary[:, 1]])
+        np.minimum.at(new, boundary[:, 1], labels[boundary[:, 0]])
+        if np.array_equal(new, labels):
+            break
+        labels = new
+    return boundary, labels[boundary[:, 0]]
+
+# Signed volume (frames,) enclosed by triangles (tris, 3) of positions
+# (frames, verts, 3), with holes closed by `caps` (cf. boundary_caps()).
+def volume(positions: np.ndarray, tris: np.ndarray,
+           caps: tuple[np.ndarray, np.ndarray] | None = None) -> np.ndarray:
+    p = positions[:, tris]
+    result = np.einsum('fti,fti->f', p[:, :, 0],
+                       np.cross(p[:, :, 1], p[:, :, 2])) / 6
+    if caps is not None and len(caps[0]):
+        edges, loops = caps
+        loop_ids, loop_index = np.unique(loops, return_inverse=True)
+        centroids = np.zeros((len(positions), len(loop_ids), 3))
+        loop_verts = np.zeros(len(loop_ids))
+        np.add.at(centroids, (slice(None), loop_index),
+                  positions[:, edges[:, 0]])
+        np.add.at(loop_verts, loop_index, 1)
+        centroids /= loop_verts[None, :, None]
+        a = positions[:, edges[:, 1]]
+        b = positions[:, edges[:, 0]]
+        c = centroids[:, loop_index]
+        result += np.einsum('fti,fti->f', a, np.cross(b, c)) / 6
+    return result
+
+# Edge length distortion |length / rest length - 1| (frames, edges).
+def edge_distortion(positions: np.ndarray, rest: np.ndarray,
+                    edges: np.ndarray) -> np.ndarray:
+    rest_len = np.linalg.norm(rest[edges[:, 1]] - rest[edges[:, 0]], axis=-1)
+    length = np.linalg.norm(
+        positions[:, edges[:, 1]] - positions[:, edges[:, 0]], axis=-1
+    )
+    return np.abs(length / rest_len - 1)
+
+# Deformation metrics per frame of skinned positions (frames, verts, 3):
+# volume loss relative to the rest pose, mean & max edge length distortion.
+def metrics(positions: np.ndarray, rest: np.ndarray,
+            tris: np.ndarray) -> dict[str, np.ndarray]:
+    caps = boundary_caps(tris)
+    rest_volume = volume(rest[None], tris, caps)[0]
+    distortion = edge_distortion(positions, rest, tri_edges(tris))
+    return {
+        'volume_loss': 1 - volume(positions, tris, caps) / rest_volume,
+        'edge_mean': distortion.mean(axis=1),
+        'edge_max': distortion.max(axis=1),
+    }
+
+# Print the metrics of several topologies, every `step` frames.
+def report(results: dict[str, dict[str, np.ndarray]], frames: np.ndarray,
+           step: int = 10) -> None:
+    print(f"{'topology':<24} {'frame':>5} {'volume loss':>12} "
+          f"{'edge mean':>10} {'edge max':>10}")
+    for name, m in results.items():
+        for i in range(0, len(frames), step):
+            print(f"{name:<24} {frames[i]:>5} {m['volume_loss'][i]:>12.2%} "
+                  f"{m['edge_mean'][i]:>10.2%} {m['edge_max'][i]:>10.2%}")
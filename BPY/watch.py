@@ -0,0 +1,419 @@
+#!/usr/bin/env -S blender --factory-startup --python
+
+# Watch mode: build a BPY script in a live Blender session, then rebuild only
+# the parts of the scene whose builder functions changed when it is saved:
+#   blender --factory-startup --python watch.py -- SCRIPT [script arguments]
+# e.g. `blender --python watch.py -- 02` then edit Owl.new_feather.
+#
+# The script is loaded as a module and its functions and methods are wrapped
+# to record each call (arguments, result) and the datablocks it created, a
+# datablock being owned by the innermost call creating it. On save, the
+# functions whose AST changed are re-executed with their recorded arguments,
+# from the innermost call returning datablocks (e.g. a helper's caller), and
+# the datablocks of the previous call are replaced by the new ones:
+# * objects keep their identity, transform, parent and collections; their
+#   data (shared with their copies) and modifiers are replaced
+# * other datablocks (materials, node groups...) are remapped by name
+# Any other change (module level code, the __main__ block, shared.py, or a
+# function whose calls return no datablock) triggers a full rebuild.
+
+import sys, os, re, ast, time, types, inspect, hashlib, traceback
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import bpy
+D = bpy.data
+
+HERE = Path(__file__).resolve().parent
+sys.path.append(str(HERE))
+import shared
+from run import find_scripts
+
+# bpy.data collections tracked for ownership, in removal order
+KINDS = ('objects', 'collections', 'meshes', 'curves', 'armatures', 'lights',
+         'cameras', 'materials', 'node_groups', 'images', 'actions')
+INTERVAL = 0.5 # seconds between file checks
+
+# One call of a wrapped function and the datablocks it owns.
+class Call:
+    def __init__(self, qualname: str, args: tuple = (), kwargs: dict = {},
+                 parent: 'Call | None' = None) -> None:
+        self.qualname = qualname
+        self.args = args
+        self.kwargs = kwargs
+        self.parent = parent
+        self.children: list[Call] = []
+        self.result: Any = None
+        self.owned: list[bpy.types.ID] = []
+
+    def walk(self) -> Iterator['Call']:
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+def snapshot() -> dict[int, bpy.types.ID]:
+    return { id.as_pointer(): id for kind in KINDS for id in getattr(D, kind) }
+
+def remapped(value: Any, remap: dict[int, bpy.types.ID]) -> Any:
+    if isinstance(value, bpy.types.ID):
+        return remap.get(value.as_pointer(), value) if is_valid(value) \
+               else value
+    if isinstance(value, list):
+        return [remapped(v, remap) for v in value]
+    if isinstance(value, tuple):
+        return tuple(remapped(v, remap) for v in value)
+    if isinstance(value, dict):
+        return { k: remapped(v, remap) for k, v in value.items() }
+    return value
+
+def is_valid(id: bpy.types.ID) -> bool:
+    try:
+        id.name
+        return True
+    except ReferenceError:
+        return False
+
+# Datablocks of a result: an ID, or lists, tuples & dicts of IDs.
+def ids_in(value: Any) -> Iterator[bpy.types.ID]:
+    if isinstance(value, bpy.types.ID):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from ids_in(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from ids_in(item)
+
+# Pairs of datablocks at the same place in two results.
+def id_pairs(old: Any, new: Any) -> Iterator[tuple[bpy.types.ID, bpy.types.ID]]:
+    if isinstance(old, bpy.types.ID) and isinstance(new, bpy.types.ID):
+        yield old, new
+    elif isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+        for o, n in zip(old, new):
+            yield from id_pairs(o, n)
+    elif isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() & new.keys():
+            yield from id_pairs(old[key], new[key])
+
+# Hash of the AST of each function and method ('Class.method'), and of the
+# rest of the module ('<module>'): formatting and comments are ignored.
+def source_hashes(source: str) -> dict[str, str]:
+    def digest(nodes: list[ast.AST]) -> str:
+        return hashlib.sha1(''.join(ast.dump(n) for n in nodes).encode()) \
+               .hexdigest()
+    hashes = {}
+    rest: list[ast.AST] = []
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.FunctionDef):
+            hashes[node.name] = digest([node])
+        elif isinstance(node, ast.ClassDef):
+            for item in node.body:
+                if isinstance(item, ast.FunctionDef):
+                    hashes[f'{node.name}.{item.name}'] = digest([item])
+                else:
+                    rest.append(item)
+            rest += node.bases + node.decorator_list
+        else:
+            rest.append(node)
+    hashes['<module>'] = digest(rest)
+    return hashes
+
+# The body of the `if __name__ == '__main__':` block.
+def main_block(source: str, filename: str) -> types.CodeType:
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.If) and \
+           ast.unparse(node.test).replace('"', "'") == "__name__ == '__main__'":
+            return compile(ast.Module(body=node.body, type_ignores=[]),
+                           filename, 'exec')
+    raise SystemExit(f'{filename}: no __main__ block')
+
+# Copy the modifiers of `src` to `dst`, with object pointers remapped.
+def modifiers_copy(src: bpy.types.Object, dst: bpy.types.Object,
+                   remap: dict[int, bpy.types.ID]) -> None:
+    dst.modifiers.clear()
+    for modifier in src.modifiers:
+        copy = dst.modifiers.new(modifier.name, modifier.type)
+        for prop in modifier.bl_rna.properties:
+            if prop.is_readonly or prop.identifier in ('name', 'type'):
+                continue
+            value = getattr(modifier, prop.identifier)
+            if isinstance(value, bpy.types.ID):
+                value = remap.get(value.as_pointer(), value)
+            try:
+                setattr(copy, prop.identifier, value)
+            except (AttributeError, TypeError, ValueError):
+                pass
+        for key in modifier.keys(): # geometry nodes inputs
+            copy[key] = modifier[key]
+
+# Move the data & modifiers of `new` into `old`, which keeps its transform,
+# parent, children and collections. Returns the object to keep.
+def object_transfer(old: bpy.types.Object, new: bpy.types.Object,
+                    remap: dict[int, bpy.types.ID]) -> bpy.types.Object:
+    if old.type != new.type:
+        new.parent = old.parent
+        new.matrix_parent_inverse = old.matrix_parent_inverse.copy()
+        new.matrix_basis = old.matrix_basis.copy()
+        old.user_remap(new)
+        return new
+
+    # copies of the object share its data, and get the same modifiers
+    objects = [old] + [o for o in D.objects
+                       if old.data is not None and o.data == old.data
+                       and o != old and o != new]
+    if old.data is not None and old.data != new.data:
+        old.data.user_remap(new.data)
+    for obj in objects:
+        modifiers_copy(new, obj, remap)
+        if obj.type == 'MESH':
+            obj.vertex_groups.clear()
+            for vg in new.vertex_groups:
+                obj.vertex_groups.new(name=vg.name)
+    return old
+
+# Remove datablocks: objects first, then the other ones left without users.
+def remove(ids: list[bpy.types.ID], keep: set[int]) -> list[bpy.types.ID]:
+    kept = []
+    ids = [id for id in ids if is_valid(id) and id.as_pointer() not in keep]
+    for kind in KINDS:
+        collection = getattr(D, kind)
+        for id in ids:
+            if not is_valid(id) or id.as_pointer() not in \
+               { i.as_pointer() for i in collection }:
+                continue
+            if kind == 'objects' or id.users == 0:
+                if kind == 'materials':
+                    shared.material_forget(id)
+                collection.remove(id)
+            else:
+                kept.append(id) # still used, e.g. a deduplicated material
+    return kept
+
+class Watch:
+    def __init__(self, script: Path, argv: list[str]) -> None:
+        self.script = script
+        self.argv = argv
+        self.module: types.ModuleType | None = None
+        self.hashes: dict[str, str] = {}
+        self.root = Call('<main>')
+        self.stack: list[Call] = []
+        self.last: Call | None = None
+        self.mtimes = self.files_mtimes()
+
+    def files_mtimes(self) -> dict[Path, float]:
+        return { p: p.stat().st_mtime for p in (self.script, HERE / 'shared.py') }
+
+    # Wrap `func` to record its calls and the datablocks they create.
+    def wrap(self, func: Callable, qualname: str, bound: bool = False) -> Callable:
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            parent = self.stack[-1] if self.stack else self.root
+            call = Call(qualname, args[1:] if bound else args, kwargs, parent)
+            parent.children.append(call)
+            before = snapshot()
+            self.stack.append(call)
+            try:
+                call.result = func(*args, **kwargs)
+            finally:
+                self.stack.pop()
+                nested = { id.as_pointer() for c in call.walk() if c is not call
+                           for id in c.owned }
+                call.owned = [id for p, id in snapshot().items()
+                              if p not in before and p not in nested]
+                self.last = call
+            return call.result
+        wrapper.__wrapped__ = func # type: ignore[attr-defined]
+        return wrapper
+
+    # Load the script as a module (its __main__ block is not executed) and
+    # wrap the functions and methods it defines.
+    def load(self) -> types.ModuleType:
+        source = self.script.read_text()
+        registry = dict(shared.material_registry) # scripts reload shared
+        module = types.ModuleType(self.script.stem)
+        module.__file__ = str(self.script)
+        sys.modules[module.__name__] = module
+        exec(compile(source, str(self.script), 'exec'), vars(module))
+        shared.material_registry.update(registry)
+
+        filename = str(self.script)
+        for name, value in list(vars(module).items()):
+            if inspect.isfunction(value) and \
+               value.__code__.co_filename == filename:
+                setattr(module, name, self.wrap(value, name))
+            elif inspect.isclass(value) and value.__module__ == module.__name__:
+                for attr, member in list(vars(value).items()):
+                    qualname = f'{name}.{attr}'
+                    if isinstance(member, classmethod):
+                        setattr(value, attr, classmethod(
+                            self.wrap(member.__func__, qualname, bound=True)))
+                    elif isinstance(member, staticmethod):
+                        setattr(value, attr, staticmethod(
+                            self.wrap(member.__func__, qualname)))
+                    elif inspect.isfunction(member) and not attr.startswith('__'):
+                        setattr(value, attr, self.wrap(member, qualname))
+        self.module = module
+        self.hashes = source_hashes(source)
+        return module
+
+    def build(self) -> None:
+        start = time.perf_counter()
+        shared.delete_data()
+        module = self.load()
+        self.root = Call('<main>')
+        argv = sys.argv
+        sys.argv = [str(self.script), '--'] + self.argv
+        try:
+            exec(main_block(self.script.read_text(), str(self.script)),
+                 vars(module))
+        finally:
+            sys.argv = argv
+        print(f'watch: built {self.script.name} in '
+              f'{time.perf_counter() - start:.2f}s')
+
+    # Re-execute `call` with its recorded arguments and swap its datablocks.
+    def rebuild(self, call: Call) -> None:
+        target: Any = self.module
+        for attr in call.qualname.split('.'):
+            target = getattr(target, attr)
+        old_ids = [id for c in call.walk() for id in c.owned if is_valid(id)]
+
+        parent = call.parent
+        assert parent is not None
+        index = parent.children.index(call)
+        self.stack = [parent]
+        try:
+            target(*call.args, **call.kwargs)
+        except Exception:
+            # keep the previous version, drop what the failed call created
+            failed = parent.children.pop()
+            remove([id for c in failed.walk() for id in c.owned], set())
+            raise
+        finally:
+            self.stack = []
+        new = parent.children.pop()
+        assert self.last is new
+        parent.children[index] = new
+
+        # result datablocks, paired by position
+        remap: dict[int, bpy.types.ID] = {} # new pointer -> kept datablock
+        replaced: set[int] = set() # old datablocks remapped to new ones
+        for old_id, new_id in id_pairs(call.result, new.result):
+            if isinstance(old_id, bpy.types.Object) and \
+               isinstance(new_id, bpy.types.Object):
+                remap[new_id.as_pointer()] = old_id
+        for old_id, new_id in id_pairs(call.result, new.result):
+            if isinstance(old_id, bpy.types.Object) and \
+               isinstance(new_id, bpy.types.Object):
+                remap[new_id.as_pointer()] = object_transfer(old_id, new_id,
+                                                             remap)
+            elif type(old_id) is type(new_id):
+                old_id.user_remap(new_id)
+                replaced.add(old_id.as_pointer())
+
+        # new objects without an old counterpart: parent & link them like
+        # the old objects
+        old_objects = [i for i in ids_in(call.result)
+                       if isinstance(i, bpy.types.Object)]
+        for obj in ids_in(new.result):
+            if not isinstance(obj, bpy.types.Object) or \
+               obj.as_pointer() in remap:
+                continue
+            if obj.parent is not None and obj.parent.as_pointer() in remap:
+                obj.parent = remap[obj.parent.as_pointer()]
+            if not obj.users_collection and old_objects:
+                for collection in old_objects[0].users_collection:
+                    collection.objects.link(obj)
+
+        # other owned datablocks, paired by name (without .001 suffixes)
+        def key(id: bpy.types.ID) -> tuple[str, str]:
+            return type(id).__name__, re.sub(r'\.\d{3}$', '', id.name)
+        new_ids = { key(id): id for c in new.walk() for id in c.owned
+                    if is_valid(id) and not isinstance(id, bpy.types.Object)
+                    and id.as_pointer() not in remap }
+        for old_id in old_ids:
+            if not is_valid(old_id) or old_id.as_pointer() in replaced \
+               or isinstance(old_id, bpy.types.Object):
+                continue
+            new_id = new_ids.get(key(old_id))
+            if new_id is not None and new_id != old_id:
+                old_id.user_remap(new_id)
+                replaced.add(old_id.as_pointer())
+
+        # remove the replaced datablocks, and the new objects merged into
+        # old ones, then record the kept objects in place of the new ones
+        merged = [new_id for old_id, new_id in id_pairs(call.result, new.result)
+                  if isinstance(new_id, bpy.types.Object)
+                  and remap.get(new_id.as_pointer()) == old_id]
+        for c in new.walk():
+            c.owned = [remap.get(id.as_pointer(), id) for id in c.owned
+                       if is_valid(id)]
+            c.result = remapped(c.result, remap)
+        keep = { id.as_pointer() for id in remap.values() }
+        new.owned += remove(old_ids + merged, keep)
+
+    # Calls to re-execute for the changed functions, or None when a full
+    # rebuild is needed.
+    def targets(self, changed: set[str]) -> list[Call] | None:
+        targets: list[Call] = []
+        for call in self.root.walk():
+            if call is self.root or call.qualname not in changed:
+                continue
+            while call.parent is not None and not any(ids_in(call.result)):
+                call = call.parent
+            if call is self.root:
+                return None
+            targets.append(call)
+        # skip calls nested in other targets
+        nested = { id(c) for t in targets for c in t.walk() if c is not t }
+        unique = { id(t): t for t in targets if id(t) not in nested }
+        return list(unique.values())
+
+    def update(self, shared_changed: bool) -> None:
+        source = self.script.read_text()
+        hashes = source_hashes(source)
+        changed = { name for name in hashes.keys() | self.hashes.keys()
+                    if hashes.get(name) != self.hashes.get(name) }
+        if shared_changed:
+            changed.add('shared.py')
+        if not changed:
+            return
+        targets = None
+        if '<module>' not in changed and not shared_changed:
+            targets = self.targets(changed)
+        if targets is None:
+            print(f'watch: {", ".join(sorted(changed))} changed, full rebuild')
+            self.build()
+            return
+
+        start = time.perf_counter()
+        self.load()
+        for call in targets:
+            self.rebuild(call)
+        print(f'watch: {", ".join(sorted(changed))} changed, rebuilt '
+              f'{", ".join(c.qualname for c in targets)} in '
+              f'{time.perf_counter() - start:.2f}s')
+
+    # Timer callback: check the files, update the scene on changes.
+    def poll(self) -> float:
+        mtimes = self.files_mtimes()
+        if mtimes != self.mtimes:
+            shared_changed = mtimes[HERE / 'shared.py'] != \
+                             self.mtimes[HERE / 'shared.py']
+            try:
+                self.update(shared_changed)
+            except Exception:
+                traceback.print_exc()
+            self.mtimes = mtimes
+        return INTERVAL
+
+if __name__ == '__main__':
+    argv = shared.argv()
+    if not argv:
+        raise SystemExit('usage: blender --python watch.py -- SCRIPT [args]')
+    os.chdir(HERE) # scripts expect to be executed from their directory
+    if '.' not in sys.path:
+        sys.path.append('.')
+    watch = Watch(find_scripts(argv[:1])[0], argv[1:])
+    watch.build()
+    bpy.app.timers.register(watch.poll, first_interval=INTERVAL,
+                            persistent=True)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+# Export the OpenSCAD models to STL, rebuilding only what changed:
+#   ./build.py [models...] [--jobs N] [--backend auto|cgal|manifold] [--out DIR]
+# The models (tools/*.scad and trinkets/*.scad by default) are exported to
+# DIR/tools/beam.stl, ... A model is rebuilt when the hash of its content, of
+# the files it includes or uses (transitively), or of the OpenSCAD version &
+# options changed since the last build (cf. DIR/.build.json). Exports run in
+# parallel, one OpenSCAD process each.
+# dep: [OpenSCAD](https://openscad.org/)
+
+import os, re, sys, json, time, shutil, hashlib, argparse, subprocess
+import typing as t
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = Path(__file__).resolve().parent
+DEFAULT_MODELS = ('tools/*.scad', 'trinkets/*.scad')
+INCLUDE = re.compile(r'^\s*(?:include|use)\s*<([^>]+)>', re.MULTILINE)
+COMMENTS = re.compile(r'//[^\n]*|/\*.*?\*/', re.DOTALL)
+
+# Directories searched after the including file's directory.
+def library_paths() -> list[Path]:
+    paths = [Path(p) for p in os.environ.get('OPENSCADPATH', '').split(os.pathsep)
+             if p]
+    if sys.platform in ('darwin', 'win32'):
+        paths.append(Path.home() / 'Documents/OpenSCAD/libraries')
+    else:
+        paths.append(Path.home() / '.local/share/OpenSCAD/libraries')
+    return paths
+
+# Models given as files or glob patterns relative to this directory.
+def find_models(patterns:t.Sequence[str]) -> list[Path]:
+    models = []
+    for pattern in patterns:
+        paths = [Path(pattern)] if Path(pattern).is_file() \
+                else sorted(HERE.glob(pattern))
+        models += [p.resolve() for p in paths]
+    return models
+
+# Files included or used by a .scad file, resolved like OpenSCAD does.
+def dependencies(path:Path, libraries:list[Path]) -> list[Path]:
+    result = []
+    for name in INCLUDE.findall(COMMENTS.sub('', path.read_text())):
+        for directory in [path.parent] + libraries:
+            candidate = (directory / name).resolve()
+            if candidate.is_file():
+                result.append(candidate)
+                break
+        else:
+            print(f'{path}: {name} not found', file=sys.stderr)
+    return result
+
+# Dependency graph of .scad files: file -> direct dependencies.
+def dependency_graph(models:list[Path]) -> dict[Path, list[Path]]:
+    libraries = library_paths()
+    graph: dict[Path, list[Path]] = {}
+    todo = list(models)
+    while todo:
+        path = todo.pop()
+        if path not in graph:
+            graph[path] = dependencies(path, libraries)
+            todo += graph[path]
+    return graph
+
+# Hash of a file's content and of its transitive dependencies' content.
+def transitive_hashes(graph:dict[Path, list[Path]]) -> dict[Path, str]:
+    content = { p: hashlib.sha256(p.read_bytes()).hexdigest() for p in graph }
+    result: dict[Path, str] = {}
+    def visit(path:Path, stack:tuple[Path, ...]) -> str:
+        if path not in result:
+            h = hashlib.sha256(content[path].encode())
+            for dep in sorted(graph[path]):
+                if dep not in stack: # include cycles are ignored
+                    h.update(visit(dep, stack + (path,)).encode())
+            result[path] = h.hexdigest()
+        return result[path]
+    for path in graph:
+        visit(path, ())
+    return result
+
+# OpenSCAD version, and the option selecting the Manifold backend when
+# supported: --backend in recent snapshots, --enable=manifold before.
+def openscad_info(openscad:str) -> tuple[str, t.Optional[str]]:
+    version = subprocess.run([openscad, '--version'], capture_output=True,
+                             text=True)
+    help = subprocess.run([openscad, '--help'], capture_output=True, text=True)
+    usage = help.stdout + help.stderr
+    if '--backend' in usage:
+        manifold = '--backend=Manifold'
+    elif 'manifold' in usage:
+        manifold = '--enable=manifold'
+    else:
+        manifold = None
+    return (version.stdout + version.stderr).strip(), manifold
+
+def export(openscad:str, model:Path, target:Path,
+           options:list[str]) -> tuple[float, t.Optional[str]]:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f'.{target.name}')
+    start = time.perf_counter()
+    result = subprocess.run([openscad, *options, '-o', str(tmp), str(model)],
+                            capture_output=True, text=True)
+    duration = time.perf_counter() - start
+    if result.returncode != 0 or not tmp.exists():
+        tmp.unlink(missing_ok=True)
+        lines = result.stderr.strip().splitlines()
+        return duration, lines[-1] if lines else 'failed'
+    os.replace(tmp, target)
+    return duration, None
+
+def main(args:argparse.Namespace):
+    openscad = args.openscad or shutil.which('openscad')
+    if openscad is None:
+        raise SystemExit('openscad not found, see --openscad')
+    version, manifold = openscad_info(openscad)
+    options = []
+    if args.backend == 'manifold' and manifold is None:
+        raise SystemExit(f'{version} does not support the Manifold backend')
+    if args.backend in ('auto', 'manifold') and manifold is not None:
+        options.append(manifold)
+    backend = 'Manifold' if options else 'CGAL'
+
+    models = find_models(args.models or DEFAULT_MODELS)
+    graph = dependency_graph(models)
+    hashes = transitive_hashes(graph)
+
+    out = args.out.resolve()
+    state_path = out / '.build.json'
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    def target(model:Path) -> Path:
+        relative = model.relative_to(HERE) if model.is_relative_to(HERE) \
+                   else Path(model.name)
+        return out / relative.with_suffix('.' + args.format)
+    def key(model:Path) -> str:
+        return hashlib.sha256(f'{hashes[model]} {version} {options}'.encode()) \
+               .hexdigest()
+    todo = [m for m in models if args.force or state.get(str(m)) != key(m)
+            or not target(m).exists()]
+    print(f'{version}, {backend} backend: {len(models) - len(todo)} models up '
+          f'to date, {len(todo)} to build')
+
+    start = time.perf_counter()
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.jobs or os.cpu_count()) as pool:
+        futures = { m: pool.submit(export, openscad, m, target(m), options)
+                    for m in todo }
+        for model, future in futures.items():
+            duration, error = future.result()
+            name = model.relative_to(HERE) if model.is_relative_to(HERE) \
+                   else model
+            if error:
+                failed.append(model)
+                print(f'{str(name):<32} {duration:>8.1f}s  {error}')
+            else:
+                state[str(model)] = key(model)
+                print(f'{str(name):<32} {duration:>8.1f}s')
+            state_path.parent.mkdir(parents=True, exist_ok=True)
+            state_path.write_text(json.dumps(state, indent=1))
+    if todo:
+        print(f"{'total':<32} {time.perf_counter() - start:>8.1f}s")
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('models', nargs='*',
+                        help=f"files or glob patterns (default: {' '.join(DEFAULT_MODELS)})")
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='parallel exports (default: cpu count)')
+    parser.add_argument('--backend', default='auto',
+                        choices=('auto', 'cgal', 'manifold'),
+                        help='auto: Manifold when supported')
+    parser.add_argument('--format', default='stl')
+    parser.add_argument('--out', type=Path, default=Path('out'))
+    parser.add_argument('--force', action='store_true')
+    parser.add_argument('--openscad', help='path of the openscad executable')
+    parser.add_argument('--graph', action='store_true',
+                        help='print the dependency graph and exit')
+    args = parser.parse_args()
+    if args.graph:
+        models = find_models(args.models or DEFAULT_MODELS)
+        for path, deps in sorted(dependency_graph(models).items()):
+            print(path.relative_to(HERE), '<-',
+                  ', '.join(str(d.relative_to(HERE)) for d in deps) or '-')
+    else:
+        main(args)
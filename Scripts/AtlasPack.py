@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+# Pack PNG images into a texture atlas:
+#   ./AtlasPack.py ../Blender/03XalIna/tex0.png ... [--padding 2] [--out DIR]
+# Images (files, or directories searched recursively) are packed with MaxRects
+# (best short side fit) into the smallest power of two atlas that fits, up to
+# --max-size. Each image is surrounded by `padding` pixels filled with its edge
+# pixels (edge bleeding), so that filtering and mipmaps do not pick up the
+# neighbors. Writes DIR/atlas.png and DIR/atlas.json, mapping each image to
+# its pixel rect [x, y, w, h] (top-left origin) and to the UV transform
+# uv_atlas = uv * scale + offset (bottom-left origin, as in Blender).
+# dep: [Pillow](https://pypi.org/project/Pillow/)
+# dep: [NumPy](https://pypi.org/project/numpy/)
+
+import json, time, argparse
+import typing as t
+from pathlib import Path
+
+import numpy as np
+from PIL import Image # type: ignore
+
+# Free rectangles of a MaxRects bin, as an (n, 4) array of x, y, w, h.
+class MaxRects:
+    def __init__(self, width:int, height:int):
+        self.free = np.array([[0, 0, width, height]], np.int64)
+
+    # Best short side fit: the free rect leaving the smallest leftover on its
+    # shorter side (then on its longer side). Returns its position, or None.
+    def insert(self, width:int, height:int) -> t.Optional[tuple[int, int]]:
+        free = self.free
+        dw, dh = free[:, 2] - width, free[:, 3] - height
+        fits = np.flatnonzero((dw >= 0) & (dh >= 0))
+        if fits.size == 0:
+            return None
+        short = np.minimum(dw[fits], dh[fits])
+        long = np.maximum(dw[fits], dh[fits])
+        best = fits[np.lexsort((long, short))[0]]
+        x, y = int(free[best, 0]), int(free[best, 1])
+        self.split(np.array([x, y, width, height]))
+        return x, y
+
+    # Replace the free rects intersecting `used` with their (up to 4) maximal
+    # parts around it, then drop the new rects contained in another one (or
+    # equal to an earlier one).
+    def split(self, used:np.ndarray):
+        x, y, w, h = self.free.T
+        ux, uy, uw, uh = used
+        hit = (x < ux + uw) & (x + w > ux) & (y < uy + uh) & (y + h > uy)
+        kept, cut = self.free[~hit], self.free[hit]
+        x, y, w, h = cut.T
+        parts = np.repeat(cut[None], 4, axis=0)
+        parts[0, :, 2] = ux - x                                     # left
+        parts[1, :, 0], parts[1, :, 2] = ux + uw, x + w - ux - uw   # right
+        parts[2, :, 3] = uy - y                                     # top
+        parts[3, :, 1], parts[3, :, 3] = uy + uh, y + h - uy - uh   # bottom
+        parts = parts.reshape(-1, 4)
+        parts = parts[(parts[:, 2] > 0) & (parts[:, 3] > 0)]
+
+        every = np.concatenate([kept, parts])
+        x0, y0 = parts[:, None, 0], parts[:, None, 1]
+        x1, y1 = x0 + parts[:, None, 2], y0 + parts[:, None, 3]
+        ex0, ey0 = every[None, :, 0], every[None, :, 1]
+        ex1, ey1 = ex0 + every[None, :, 2], ey0 + every[None, :, 3]
+        contained = (x0 >= ex0) & (y0 >= ey0) & (x1 <= ex1) & (y1 <= ey1)
+        # among equal parts, only keep the first one
+        n = len(parts)
+        equal = contained[:, len(kept):] & contained[:, len(kept):].T
+        contained[:, len(kept):] &= ~(equal & np.tri(n, n, dtype=bool).T)
+        self.free = np.concatenate([kept, parts[~contained.any(1)]])
+
+# Positions of `sizes` in a width x height bin (in the given order), or None
+# when they do not all fit.
+def pack(sizes:np.ndarray, width:int, height:int
+         ) -> t.Optional[np.ndarray]:
+    bin = MaxRects(width, height)
+    positions = np.zeros_like(sizes)
+    for i, (w, h) in enumerate(sizes):
+        position = bin.insert(int(w), int(h))
+        if position is None:
+            return None
+        positions[i] = position
+    return positions
+
+# Pack in the smallest power of two atlas, growing its smaller side first.
+# Larger images are placed first. Returns the atlas size & positions.
+def pack_atlas(sizes:np.ndarray, max_size:int
+               ) -> tuple[tuple[int, int], np.ndarray]:
+    if (sizes > max_size).any():
+        raise SystemExit(f'an image is larger than {max_size}px with padding')
+    order = np.lexsort((sizes.min(1), sizes.max(1)))[::-1]
+    area = int((sizes[:, 0] * sizes[:, 1]).sum())
+    width = height = 1 << max(0, int(np.ceil(np.log2(np.sqrt(area)))) - 1)
+    width = max(width, 1 << int(np.ceil(np.log2(sizes[:, 0].max()))))
+    height = max(height, 1 << int(np.ceil(np.log2(sizes[:, 1].max()))))
+    while width * height < area:
+        width, height = (width * 2, height) if width <= height else (width, height * 2)
+    while True:
+        positions = pack(sizes[order], width, height)
+        if positions is not None:
+            result = np.empty_like(positions)
+            result[order] = positions
+            return (width, height), result
+        if width >= max_size and height >= max_size:
+            raise SystemExit(f'images do not fit in {max_size}x{max_size}')
+        if width <= height and width < max_size or height >= max_size:
+            width *= 2
+        else:
+            height *= 2
+
+# Images to pack, named by their path relative to the given directory (or
+# their stem for files), without the .png suffix.
+def find_images(paths:t.Sequence[Path]) -> dict[str, Path]:
+    result = {}
+    for path in paths:
+        if path.is_dir():
+            for p in sorted(path.rglob('*.png')):
+                result[p.relative_to(path).with_suffix('').as_posix()] = p
+        else:
+            result[path.stem] = path
+    return result
+
+def main(args:argparse.Namespace):
+    images = find_images(args.paths)
+    if not images:
+        raise SystemExit('no images')
+    arrays = {}
+    for name, path in images.items():
+        with Image.open(path) as image:
+            arrays[name] = np.asarray(image.convert('RGBA'))
+    p = args.padding
+    sizes = np.array([(a.shape[1] + 2 * p, a.shape[0] + 2 * p)
+                      for a in arrays.values()], np.int64)
+
+    start = time.perf_counter()
+    (width, height), positions = pack_atlas(sizes, args.max_size)
+    duration = time.perf_counter() - start
+
+    atlas = np.zeros((height, width, 4), np.uint8)
+    rects = {}
+    for (name, array), (x, y) in zip(arrays.items(), positions.tolist()):
+        h, w = array.shape[:2]
+        atlas[y:y + h + 2 * p, x:x + w + 2 * p] = np.pad(
+            array, ((p, p), (p, p), (0, 0)), 'constant' if args.no_bleed else 'edge'
+        )
+        x, y = x + p, y + p
+        rects[name] = {
+            'rect': [x, y, w, h],
+            'uv': { 'offset': [x / width, 1 - (y + h) / height],
+                    'scale': [w / width, h / height] },
+        }
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(atlas).save(args.out / 'atlas.png', optimize=True)
+    (args.out / 'atlas.json').write_text(json.dumps({
+        'image': 'atlas.png', 'size': [width, height], 'padding': p,
+        'sprites': rects,
+    }, indent=1))
+    used = float((sizes[:, 0] * sizes[:, 1]).sum()) / (width * height)
+    print(f'{len(images)} images in {width}x{height} ({used:.0%} used), '
+          f'packed in {duration * 1000:.0f}ms')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', type=Path, nargs='+',
+                        help='PNG files or directories')
+    parser.add_argument('--padding', type=int, default=2,
+                        help='pixels around each image (default: 2)')
+    parser.add_argument('--no-bleed', action='store_true',
+                        help='leave the padding transparent')
+    parser.add_argument('--max-size', type=int, default=8192)
+    parser.add_argument('--out', type=Path, default=Path('out/AtlasPack'))
+    main(parser.parse_args())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+# Benchmark the image generators against a baseline:
+#   ./Bench.py [--generators EyeTexture ...] [--sizes tiny ... 8K] [--save]
+# Each generator runs over a size ladder (longest side from 64px to 8192px),
+# every case in its own Python process (in a temporary directory), recording
+# the best wall time of --repeat runs, the peak RSS of the process, the
+# tracemalloc peak (measured in a separate run) and the SHA-256 of the pixels.
+# Results are compared with the baseline (--baseline, saved with --save): the
+# exit code is 1 when a case is slower or uses more memory than the baseline
+# by more than --threshold percent, or when its output changed. The
+# NewsCaster textures (fixed size) are only benchmarked where bpy can be
+# imported, e.g. with Blender's Python.
+# dep: [Pillow](https://pypi.org/project/Pillow/)
+
+import sys, json, time, hashlib, platform, argparse, resource, tempfile
+import subprocess, tracemalloc, importlib.util
+import typing as t
+from pathlib import Path
+
+import PIL
+from PIL import Image # type: ignore
+
+HERE = Path(__file__).resolve().parent
+BPY = HERE.parent / 'BPY'
+LADDER = { 'tiny': 64, 'small': 256, 'medium': 1024, '2K': 2048, '4K': 4096,
+           '8K': 8192 }
+
+def eye_texture(size:int) -> Image.Image:
+    import EyeTexture
+    return EyeTexture.eye_image((max(1, size * 54 // 78), size))
+
+def dimetric_grid(size:int) -> Image.Image:
+    import DimetricGrid
+    from DimetricGrid import Grid, Tile, Edge, Segment
+    tile = Tile(Edge(Segment(width=4, height=2, n=8)))
+    grid = Grid(tile, n=(max(1, size // tile.width()), max(1, size // tile.height())))
+    return DimetricGrid.image(grid)
+
+# NewsCaster's *_texture class methods, which save their image to the current
+# directory before loading it in Blender.
+def news_caster(method:str) -> t.Callable[[int], Image.Image]:
+    def generate(size:int) -> Image.Image:
+        sys.path.append(str(BPY))
+        module = importlib.import_module('03NewsCaster')
+        before = set(Path().glob('*.png'))
+        getattr(module.Character, method)()
+        written = set(Path().glob('*.png')) - before or set(Path().glob('03Tmp*.png'))
+        return Image.open(max(written, key=lambda p: p.stat().st_mtime))
+    return generate
+
+# Generators: name -> sizes, function generating the image of a given size.
+GENERATORS: dict[str, tuple[t.Sequence[str], t.Callable[[int], Image.Image]]] = {
+    'EyeTexture': (tuple(LADDER), eye_texture),
+    'DimetricGrid': (tuple(LADDER), dimetric_grid),
+}
+if importlib.util.find_spec('bpy') is not None:
+    for method in ('head_texture', 'torso_texture', 'leg_texture',
+                   'pelvis_texture'):
+        GENERATORS[f'NewsCaster.{method}'] = (('512',), news_caster(method))
+
+def size_of(name:str) -> int:
+    return LADDER.get(name) or int(name)
+
+def pixels_hash(image:Image.Image) -> str:
+    h = hashlib.sha256(f'{image.mode} {image.size}'.encode())
+    h.update(image.tobytes())
+    return h.hexdigest()
+
+# Worker: run one case in the current process, print its results as JSON.
+def run_case(generator:str, size:str, repeat:int) -> None:
+    sys.path.insert(0, str(HERE))
+    function = GENERATORS[generator][1]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        image = function(size_of(size))
+        image.load()
+        times.append(time.perf_counter() - start)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    function(size_of(size)).load()
+    _, traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({
+        'time': min(times), 'rss': rss * (1 if sys.platform == 'darwin' else 1024),
+        'tracemalloc': traced, 'sha256': pixels_hash(image),
+        'size': list(image.size),
+    }))
+
+# Run a case in a new process; None when it failed (e.g. out of memory) or
+# timed out.
+def measure(generator:str, size:str, args:argparse.Namespace
+            ) -> t.Optional[dict[str, t.Any]]:
+    def limit_memory():
+        if args.memory_limit:
+            limit = int(args.memory_limit * 2**30)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            result = subprocess.run(
+                [sys.executable, str(Path(__file__).resolve()), '--case',
+                 generator, size, '--repeat', str(args.repeat)],
+                cwd=tmp, capture_output=True, text=True, timeout=args.timeout,
+                preexec_fn=limit_memory,
+            )
+        except subprocess.TimeoutExpired:
+            print(f'{generator} {size}: timed out after {args.timeout}s')
+            return None
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        print(f"{generator} {size}: {lines[-1] if lines else 'failed'}")
+        return None
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def format_bytes(size:float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f'{size:.0f}{unit}'
+        size /= 1024
+    return f'{size:.1f}GiB'
+
+# Regressions of a case compared with its baseline. Time differences under
+# 1ms are ignored, as noise.
+def regressions(current:dict, baseline:dict, threshold:float) -> list[str]:
+    result = []
+    for key in ('time', 'rss', 'tracemalloc'):
+        if key == 'time' and current[key] - baseline.get(key, 0) < 1e-3:
+            continue
+        if baseline.get(key) and current[key] > baseline[key] * (1 + threshold / 100):
+            result.append(f'{key} +{current[key] / baseline[key] - 1:.0%}')
+    if baseline.get('sha256') and current['sha256'] != baseline['sha256']:
+        result.append('output changed')
+    return result
+
+def main(args:argparse.Namespace):
+    baseline = json.loads(args.baseline.read_text()) \
+               if args.baseline.exists() else {}
+    cases = baseline.get('cases', {})
+    results: dict[str, dict] = {}
+    failed = []
+    print(f"{'case':<36} {'time':>9} {'rss':>9} {'traced':>9}  vs baseline")
+    for generator in args.generators or GENERATORS:
+        if generator not in GENERATORS:
+            print(f'{generator}: unknown generator (bpy needed for NewsCaster)')
+            continue
+        for size in GENERATORS[generator][0]:
+            if args.sizes and size not in args.sizes:
+                continue
+            key = f'{generator} {size}'
+            current = measure(generator, size, args)
+            if current is None:
+                failed.append(key)
+                continue
+            results[key] = current
+            previous = cases.get(key)
+            if previous is None:
+                status = 'new'
+            else:
+                problems = regressions(current, previous, args.threshold)
+                status = ', '.join(problems) or \
+                         f"{current['time'] / previous['time'] - 1:+.0%}"
+                if problems:
+                    failed.append(key)
+            print(f"{key:<36} {current['time'] * 1000:>7.1f}ms "
+                  f"{format_bytes(current['rss']):>9} "
+                  f"{format_bytes(current['tracemalloc']):>9}  {status}")
+
+    if args.save:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({
+            'python': platform.python_version(), 'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cases': { **cases, **results },
+        }, indent=1))
+        print(f'baseline saved to {args.baseline}')
+    elif failed:
+        print(f"{len(failed)} regressions or failures: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--generators', nargs='+', metavar='NAME',
+                        help=f"default: {' '.join(GENERATORS)}")
+    parser.add_argument('--sizes', nargs='+', metavar='SIZE',
+                        help=f"default: {' '.join(LADDER)}")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per case, the fastest is kept')
+    parser.add_argument('--baseline', type=Path,
+                        default=Path('out/bench_baseline.json'))
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='tolerated slowdown / memory increase, in percent')
+    parser.add_argument('--timeout', type=float, default=600.0,
+                        help='seconds per case')
+    parser.add_argument('--memory-limit', type=float, default=8.0,
+                        help='GiB per case, 0 for none')
+    parser.add_argument('--case', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.case:
+        run_case(*args.case, args.repeat)
+    else:
+        main(args)
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+
+# List the datablocks of .blend files without Blender:
+#   ./BlendInfo.py ../Blender/02Bedroom/scene.blend [--type Mesh Image] [--blocks]
+# Uncompressed files are memory-mapped and only the block headers, the SDNA
+# and the beginning of ID blocks are read. Compressed files (gzip, or zstd
+# with zstandard or Python >= 3.14) are decompressed as a stream, skipping
+# the data of the other blocks.
+# dep (optional): [zstandard](https://pypi.org/project/zstandard/)
+# ref: https://fossies.org/linux/blender/doc/blender_file_format/mystery_of_the_blend.html
+# ref: https://developer.blender.org/docs/features/core/blend_file/
+
+import re, mmap, gzip, struct, argparse, collections
+import typing as t
+from pathlib import Path
+from dataclasses import dataclass, field
+
+try:
+    from compression import zstd # Python >= 3.14
+except ImportError:
+    try:
+        import zstandard as zstd # type: ignore
+    except ImportError:
+        zstd = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+@dataclass
+class Header:
+    version: str     # e.g. '4.1'
+    pointer_size: int
+    endian: str      # struct byte order: '<' or '>'
+    size: int        # header size in bytes
+    bhead: str       # struct format of block headers
+
+    @classmethod
+    def parse(cls, data:bytes) -> 'Header':
+        if not data.startswith(b'BLENDER'):
+            raise ValueError('not a .blend file')
+        # Blender >= 5.0: BLENDER17-01v0500, 64-bit block headers
+        # (code, SDNA index, old pointer, length, count)
+        m = re.match(rb'BLENDER(\d\d)-(\d\d)([vV])(\d{4})', data)
+        if m:
+            endian = '<' if m[3] == b'v' else '>'
+            version = m[4].decode()
+            return cls(f'{int(version[:2])}.{int(version[2:])}', 8, endian,
+                       int(m[1]), endian + '4siQqq')
+        # legacy: BLENDER-v401, '-' for 8-byte pointers, '_' for 4-byte
+        # (code, length, old pointer, SDNA index, count)
+        m = re.match(rb'BLENDER([-_])([vV])(\d{3})', data)
+        if not m:
+            raise ValueError(f'unknown header {data[:17]!r}')
+        pointer_size = 8 if m[1] == b'-' else 4
+        endian = '<' if m[2] == b'v' else '>'
+        version = m[3].decode()
+        return cls(f'{version[0]}.{int(version[1:])}', pointer_size, endian, 12,
+                   endian + '4si' + ('Q' if pointer_size == 8 else 'I') + 'ii')
+
+@dataclass
+class BHead:
+    code: str
+    size: int
+    old: int     # address of the block's data when it was saved
+    sdna: int    # index of the block's struct in the SDNA
+    count: int   # number of structs
+    offset: int  # offset of the block's data in the (decompressed) file
+
+@dataclass
+class Struct:
+    type: str
+    size: int
+    fields: dict[str, tuple[int, str, str]] # name -> (offset, type, full name)
+
+# Struct definitions stored in the DNA1 block.
+class SDNA:
+    def __init__(self, data:bytes, endian:str, pointer_size:int):
+        self.pointer_size = pointer_size
+        offset = 8 # 'SDNA' 'NAME'
+        def strings() -> list[str]:
+            nonlocal offset
+            count, = struct.unpack_from(endian + 'i', data, offset)
+            offset += 4
+            result = []
+            for _ in range(count):
+                end = data.index(b'\0', offset)
+                result.append(bytes(data[offset:end]).decode())
+                offset = end + 1
+            offset = (offset + 3) & ~3
+            return result
+        names = strings()
+        offset += 4 # 'TYPE'
+        types = strings()
+        offset += 4 # 'TLEN'
+        lengths = struct.unpack_from(f'{endian}{len(types)}h', data, offset)
+        offset = (offset + 2 * len(types) + 3) & ~3
+        offset += 4 # 'STRC'
+        count, = struct.unpack_from(endian + 'i', data, offset)
+        offset += 4
+
+        self.lengths = dict(zip(types, lengths))
+        self.structs: list[Struct] = []
+        self.by_type: dict[str, Struct] = {}
+        for _ in range(count):
+            type_index, nfields = struct.unpack_from(endian + 'hh', data, offset)
+            members = struct.unpack_from(f'{endian}{2 * nfields}h', data,
+                                         offset + 4)
+            offset += 4 + 4 * nfields
+            fields = {}
+            position = 0
+            for member_type, member_name in zip(members[::2], members[1::2]):
+                name = names[member_name]
+                fields[self.field_name(name)] = (position, types[member_type],
+                                                 name)
+                position += self.field_size(name, lengths[member_type])
+            s = Struct(types[type_index], lengths[type_index], fields)
+            self.structs.append(s)
+            self.by_type[s.type] = s
+
+    @staticmethod
+    def field_name(name:str) -> str:
+        return re.sub(r'[*()]|\[.*', '', name)
+
+    def field_size(self, name:str, type_size:int) -> int:
+        size = self.pointer_size if name.startswith(('*', '(*')) else type_size
+        for n in re.findall(r'\[(\d+)\]', name):
+            size *= int(n)
+        return size
+
+    # Offset of a field, e.g. offset('ID', 'name').
+    def offset(self, type:str, name:str) -> int:
+        return self.by_type[type].fields[name][0]
+
+@dataclass
+class Datablock:
+    code: str
+    type: str
+    name: str
+    size: int        # bytes of the ID block and of its DATA blocks
+    block: BHead
+    data: list[BHead] = field(default_factory=list)
+
+# Reader of a .blend file: mmap when uncompressed, a decompression stream
+# otherwise (blocks can then only be visited once, in order).
+class BlendFile:
+    def __init__(self, path:t.Union[str, Path]):
+        self.path = Path(path)
+        self.file = open(self.path, 'rb')
+        magic = self.file.read(4)
+        self.file.seek(0)
+        self.map: t.Optional[mmap.mmap] = None
+        self.stream: t.Optional[t.BinaryIO] = None
+        self.compressed = magic.startswith(GZIP_MAGIC) or magic == ZSTD_MAGIC
+        if self.compressed:
+            self.open_stream()
+        else:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = Header.parse(self.read_at(0, 17))
+        self.bhead = struct.Struct(self.header.bhead)
+        self._sdna: t.Optional[SDNA] = None
+
+    # (Re)start decompressing from the beginning of the file.
+    def open_stream(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.file.seek(0)
+        self.position = 0
+        if self.file.read(2) == GZIP_MAGIC:
+            self.file.seek(0)
+            self.stream = t.cast(t.BinaryIO, gzip.GzipFile(fileobj=self.file))
+            return
+        if zstd is None:
+            raise RuntimeError(f'{self.path}: zstd compressed, requires the '
+                               'zstandard module or Python >= 3.14')
+        self.file.seek(0)
+        if hasattr(zstd, 'ZstdFile'): # Python >= 3.14
+            self.stream = t.cast(t.BinaryIO, zstd.ZstdFile(self.file))
+        else: # zstandard
+            self.stream = zstd.ZstdDecompressor().stream_reader(
+                self.file, closefd=False)
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        if self.stream is not None:
+            self.stream.close()
+        self.file.close()
+
+    def __enter__(self) -> 'BlendFile':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Bytes at an offset: a slice of the mmap, or read from the stream, which
+    # only moves forward.
+    def read_at(self, offset:int, size:int) -> bytes:
+        if self.map is not None:
+            return self.map[offset:offset + size]
+        assert self.stream is not None
+        if offset < self.position:
+            raise ValueError('compressed .blend files are read sequentially')
+        self.skip(offset - self.position)
+        data = self.stream.read(size)
+        self.position += len(data)
+        return data
+
+    # Skip stream data: it is decompressed anyway, but never kept in memory.
+    def skip(self, size:int):
+        assert self.stream is not None
+        while size > 0:
+            chunk = self.stream.read(min(size, 1 << 20))
+            if not chunk:
+                break
+            size -= len(chunk)
+            self.position += len(chunk)
+
+    # Iterate over the block headers and the data wanted by `want`, which
+    # returns how many bytes of a block to read (-1 for all of it).
+    def blocks(self, want:t.Optional[t.Callable[[BHead], int]] = None
+               ) -> t.Iterator[tuple[BHead, bytes]]:
+        offset = self.header.size
+        if self.stream is not None and self.position > offset:
+            self.open_stream()
+        size = self.bhead.size
+        while True:
+            data = self.read_at(offset, size)
+            if len(data) < size:
+                return
+            fields = self.bhead.unpack(data)
+            if self.header.size == 12: # legacy field order
+                code, length, old, sdna, count = fields
+            else:
+                code, sdna, old, length, count = fields
+            head = BHead(code.rstrip(b'\0').decode('latin-1'), length, old,
+                         sdna, count, offset + size)
+            n = want(head) if want else 0
+            n = head.size if n < 0 else min(n, head.size)
+            block = self.read_at(head.offset, n) if n else b''
+            yield head, block
+            if head.code == 'ENDB':
+                return
+            offset = head.offset + head.size
+
+    # The SDNA, parsed once: it is stored at the end of the file, so streams
+    # are read up to it (cf. datablocks() which reads everything in one pass).
+    def sdna(self) -> SDNA:
+        if self._sdna is None:
+            for head, data in self.blocks(lambda h: -1 if h.code == 'DNA1' else 0):
+                if head.code == 'DNA1':
+                    self._sdna = SDNA(data, self.header.endian,
+                                      self.header.pointer_size)
+                    break
+            else:
+                raise ValueError(f'{self.path}: no DNA1 block')
+        return self._sdna
+
+    # ID datablocks (2-letter codes) with their names, in a single pass. The
+    # DATA blocks following an ID block are counted as part of it, as Blender
+    # writes an ID's data right after it.
+    def datablocks(self, with_data:bool = False) -> list[Datablock]:
+        # the name is 66 (258 since 5.0) bytes after a few pointers: reading
+        # the first 512 bytes of ID blocks avoids needing the SDNA first
+        heads: list[tuple[BHead, bytes]] = []
+        sdna = None
+        for head, data in self.blocks(lambda h: 512 if len(h.code) == 2
+                                      else -1 if h.code == 'DNA1' else 0):
+            if head.code == 'DNA1':
+                sdna = SDNA(data, self.header.endian, self.header.pointer_size)
+            heads.append((head, bytes(data) if len(head.code) == 2 else b''))
+        if sdna is None:
+            raise ValueError(f'{self.path}: no DNA1 block')
+        self._sdna = sdna
+        name_offset = sdna.offset('ID', 'name')
+
+        result: list[Datablock] = []
+        current = None
+        for head, data in heads:
+            if len(head.code) == 2:
+                raw = data[name_offset:data.index(b'\0', name_offset)]
+                current = Datablock(head.code, sdna.structs[head.sdna].type,
+                                    raw[2:].decode('utf-8', 'replace'),
+                                    self.bhead.size + head.size, head)
+                result.append(current)
+            elif head.code == 'DATA' and current is not None:
+                current.size += self.bhead.size + head.size
+                if with_data:
+                    current.data.append(head)
+            else:
+                current = None
+        return result
+
+def format_size(size:float) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+    return f'{size:.1f} GiB'
+
+def info(path:Path, types:t.Sequence[str] = (), blocks:bool = False):
+    with BlendFile(path) as blend:
+        h = blend.header
+        print(f"{path}: Blender {h.version}, {h.pointer_size * 8}-bit pointers, "
+              f"{'little' if h.endian == '<' else 'big'} endian"
+              f"{', compressed' if blend.compressed else ''}, "
+              f"{format_size(path.stat().st_size)}")
+        if blocks:
+            counts: dict[str, list[int]] = collections.defaultdict(lambda: [0, 0])
+            for head, _ in blend.blocks():
+                counts[head.code][0] += 1
+                counts[head.code][1] += head.size
+            print(f"  {'block':<6} {'count':>7} {'size':>10}")
+            for code, (count, size) in sorted(counts.items()):
+                print(f"  {code:<6} {count:>7} {format_size(size):>10}")
+            return
+
+        datablocks = [d for d in blend.datablocks()
+                      if not types or d.type in types or d.code in types]
+    totals: dict[str, list[int]] = collections.defaultdict(lambda: [0, 0])
+    print(f"  {'code':<4} {'type':<16} {'name':<32} {'size':>10}")
+    for d in sorted(datablocks, key=lambda d: (d.type, d.name)):
+        print(f"  {d.code:<4} {d.type:<16} {d.name:<32} {format_size(d.size):>10}")
+        totals[d.type][0] += 1
+        totals[d.type][1] += d.size
+    print(f"  {'type':<21} {'count':>32} {'size':>10}")
+    for type, (count, size) in sorted(totals.items(), key=lambda i: -i[1][1]):
+        print(f"  {type:<21} {count:>32} {format_size(size):>10}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', type=Path, nargs='+')
+    parser.add_argument('--type', nargs='+', default=(),
+                        help='datablock types or codes, e.g. Mesh Image MA')
+    parser.add_argument('--blocks', action='store_true',
+                        help='list the block codes instead of the datablocks')
+    args = parser.parse_args()
+    for path in args.files:
+        info(path, args.type, args.blocks)
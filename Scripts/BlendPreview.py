@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+# Extract the preview thumbnail and the packed images of .blend files to PNG,
+# without Blender:
+#   ./BlendPreview.py ../Blender [files or directories...] [--out DIR]
+# Files are processed in parallel. Files unchanged since the last run (same
+# mtime & size, or same content hash) are skipped, cf. DIR/.previews.json.
+# dep: [Pillow](https://pypi.org/project/Pillow/)
+
+import io, json, struct, hashlib, argparse
+import typing as t
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image # type: ignore
+
+from BlendInfo import BlendFile, BHead, SDNA
+
+def file_hash(path:Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+    return h.hexdigest()
+
+# Thumbnail of the TEST block: width, height, then RGBA rows bottom-up.
+def thumbnail(data:bytes, endian:str) -> Image.Image:
+    width, height = struct.unpack_from(endian + 'ii', data)
+    image = Image.frombuffer('RGBA', (width, height),
+                             data[8:8 + 4 * width * height], 'raw', 'RGBA', 0, 1)
+    return image.transpose(Image.Transpose.FLIP_TOP_BOTTOM)
+
+# Extract the thumbnail & packed images of `path` to `out`. Returns the
+# written files.
+def extract(path:Path, out:Path) -> list[Path]:
+    prefix = f'{path.parent.name}_{path.stem}'
+    written = []
+    with BlendFile(path) as blend:
+        endian = blend.header.endian
+        pointer = endian + ('Q' if blend.header.pointer_size == 8 else 'I')
+
+        # a single pass keeping the TEST block, the SDNA, the images and the
+        # DATA blocks following them (their packed files & data)
+        blocks: dict[int, tuple[BHead, bytes]] = {}
+        images: list[tuple[BHead, bytes]] = []
+        test = dna = None
+        in_image = False
+        def want(head:BHead) -> int:
+            nonlocal in_image
+            if head.code != 'DATA':
+                in_image = head.code == 'IM'
+            return -1 if in_image or head.code in ('TEST', 'DNA1') else 0
+        for head, data in blend.blocks(want):
+            if head.code == 'TEST':
+                test = data
+            elif head.code == 'DNA1':
+                dna = data
+            elif head.code == 'IM':
+                images.append((head, data))
+            elif head.code == 'DATA' and data:
+                blocks[head.old] = (head, data)
+
+        if test is not None:
+            target = out / f'{prefix}.png'
+            thumbnail(test, endian).save(target)
+            written.append(target)
+        if not images or dna is None:
+            return written
+
+        sdna = SDNA(dna, endian, blend.header.pointer_size)
+        def field(type:str, name:str) -> int:
+            return sdna.offset(type, name)
+        def read_pointer(data:bytes, offset:int) -> int:
+            return struct.unpack_from(pointer, data, offset)[0]
+        def packed_data(address:int) -> t.Optional[bytes]:
+            if address not in blocks:
+                return None
+            packed = blocks[address][1]
+            size, = struct.unpack_from(endian + 'i', packed,
+                                       field('PackedFile', 'size'))
+            data_address = read_pointer(packed, field('PackedFile', 'data'))
+            if data_address not in blocks:
+                return None
+            return blocks[data_address][1][:size]
+
+        for head, data in images:
+            name_offset = field('ID', 'name')
+            name = data[name_offset + 2:data.index(b'\0', name_offset)].decode()
+            packed = []
+            # Blender >= 2.8: list of ImagePackedFile (one per view/tile)
+            address = read_pointer(data, field('Image', 'packedfiles'))
+            while address in blocks:
+                item = blocks[address][1]
+                packed.append(packed_data(
+                    read_pointer(item, field('ImagePackedFile', 'packedfile'))
+                ))
+                address = read_pointer(item, field('ImagePackedFile', 'next'))
+            if not packed and 'packedfile' in sdna.by_type['Image'].fields:
+                packed.append(packed_data(
+                    read_pointer(data, field('Image', 'packedfile'))
+                ))
+
+            for i, content in enumerate(p for p in packed if p):
+                stem = Path(name).stem + (f'_{i}' if i else '')
+                target = out / f'{prefix}_{stem}.png'
+                if content.startswith(b'\x89PNG'):
+                    target.write_bytes(content)
+                else: # e.g. JPEG or OpenEXR supported by Pillow
+                    Image.open(io.BytesIO(content)).save(target)
+                written.append(target)
+    return written
+
+def find_blends(paths:t.Sequence[Path]) -> list[Path]:
+    result = []
+    for path in paths:
+        result += sorted(path.rglob('*.blend')) if path.is_dir() else [path]
+    return result
+
+def main(args:argparse.Namespace):
+    args.out.mkdir(parents=True, exist_ok=True)
+    state_path = args.out / '.previews.json'
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+
+    # skip unchanged files: same mtime & size, otherwise same content hash
+    todo = []
+    for path in find_blends(args.paths):
+        key = str(path.resolve())
+        stat = path.stat()
+        entry = state.get(key)
+        if entry and not args.force:
+            if (entry['mtime'], entry['size']) == (stat.st_mtime, stat.st_size):
+                continue
+            digest = file_hash(path)
+            if digest == entry['sha256']:
+                entry['mtime'] = stat.st_mtime
+                continue
+        todo.append(path)
+    print(f'{len(todo)} files to extract')
+
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as pool:
+        futures = { path: pool.submit(extract, path, args.out) for path in todo }
+        for path, future in futures.items():
+            try:
+                written = future.result()
+            except Exception as e:
+                print(f'{path}: {e}')
+                continue
+            stat = path.stat()
+            state[str(path.resolve())] = { 'mtime': stat.st_mtime,
+                'size': stat.st_size, 'sha256': file_hash(path) }
+            print(f"{path}: {', '.join(p.name for p in written) or 'nothing'}")
+
+    state_path.write_text(json.dumps(state, indent=1))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', type=Path, nargs='+',
+                        help='.blend files or directories')
+    parser.add_argument('--out', type=Path, default=Path('out/BlendPreview'))
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='worker processes (default: cpu count)')
+    parser.add_argument('--force', action='store_true',
+                        help='extract unchanged files too')
+    main(parser.parse_args())
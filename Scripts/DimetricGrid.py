@@ -3,13 +3,17 @@
 # Dimetric grid generator
 # screenshot: https://i.imgur.com/HxSRk4C.png
 # dep: [Pillow](https://pypi.org/project/Pillow/)
+# dep (optional, array()): [NumPy](https://pypi.org/project/numpy/)
 
+import argparse
 import typing as t
 import collections
 from PIL import Image, ImageDraw # type: ignore
 from pathlib import Path
 from dataclasses import dataclass
 
+from PngOutput import save_png
+
 @dataclass
 class Segment:
     width:int; height:int; n:int
@@ -96,15 +100,27 @@ class Grid:
     def __str__(self):
         return f"g{self.width()}x{self.height()}_{self.tile}"
 
-def save(element):
-    filename = Path('out') / f"DimetricGrid_{element}.png"
-    filename.parent.mkdir(exist_ok=True)
-    element.image(fgcolor="#4B5263", bgcolor="#ABB2BF") \
-           .save(filename)
+def image(element, fgcolor:str="#4B5263", bgcolor:str="#ABB2BF") -> Image.Image:
+    return element.image(fgcolor=fgcolor, bgcolor=bgcolor)
+
+# RGBA pixels of the element, of shape (height, width, 4).
+def array(element, **colors):
+    import numpy as np
+    return np.asarray(image(element, **colors))
+
+# Write the element as PNG to a path, a binary file object or stdout ('-'),
+# by default to out/DimetricGrid_{element}.png.
+def save(element, target:t.Union[str, Path, t.BinaryIO, None]=None, **colors):
+    save_png(image(element, **colors),
+             target or Path('out') / f"DimetricGrid_{element}.png")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--out', help="PNG path, or '-' for stdout "
+                                      "(default: out/DimetricGrid_{grid}.png)")
+    args = parser.parse_args()
     grid = Grid(
         tile = Tile(Edge(Segment(width=4, height=2, n=8))),
         n = (10, 10)
     )
-    save(grid)
+    save(grid, args.out)
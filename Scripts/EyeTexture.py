@@ -1,7 +1,19 @@
 #!/usr/bin/env python3
 
+# Stylized eye texture:
+#   ./EyeTexture.py [--size 54 78] [--out PATH|-]
+# As a library: eye_image(size) returns a PIL image, eye_array(size) its RGBA
+# pixels, and save(image, target) writes it as PNG to a path, a binary file
+# object, or stdout ('-').
+
+import argparse
+from pathlib import Path
+
+import numpy as np # https://pypi.org/project/numpy/
 import PIL.Image, PIL.ImageDraw # https://pypi.org/project/Pillow/
 
+from PngOutput import save_png as save
+
 def ellipse_helper(draw, size, scale=(1.0, 1.0), translate=(0, 0), **kwargs):
     x1 = size[0] * scale[0]
     y1 = size[1] * scale[1]
@@ -11,7 +23,7 @@ def ellipse_helper(draw, size, scale=(1.0, 1.0), translate=(0, 0), **kwargs):
     y1 += translate[1]
     draw.ellipse(xy=(x0, y0, x1, y1), **kwargs)
 
-def eye_texture(size):
+def eye_image(size):
     image = PIL.Image.new('RGBA', size)
     draw0 = PIL.ImageDraw.Draw(image)
 
@@ -30,11 +42,9 @@ def eye_texture(size):
     ellipse_helper(draw1, size, scale=(0.99, 0.99), fill=(0, 0, 0, 40))
     ellipse_helper(draw1, size, scale=(0.99, 0.99), translate=(0, size[1] // 3),
                    fill=(0, 255, 0))
-    shadow.putdata(tuple(
-        (0, 0, 0, 0) if color == (0, 255, 0, 255) else color
-        for color in shadow.getdata()
-    ))
-    image.alpha_composite(shadow)
+    pixels = np.array(shadow)
+    pixels[(pixels == (0, 255, 0, 255)).all(axis=2)] = 0
+    image.alpha_composite(PIL.Image.fromarray(pixels))
 
     # specular highlights
     draw0.ellipse(
@@ -46,7 +56,24 @@ def eye_texture(size):
         fill=(255, 255, 255),
     )
 
-    image.save(f'out/EyeTexture_{size[0]}x{size[1]}.png')
+    return image
+
+def eye_array(size):
+    return np.asarray(eye_image(size))
+
+def eye_texture(size):
+    target = Path('out') / f'EyeTexture_{size[0]}x{size[1]}.png'
+    save(eye_image(size), target)
+    return target
 
 if __name__ == "__main__":
-    eye_texture(size=(54, 78))
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, nargs=2, default=(54, 78),
+                        metavar=('WIDTH', 'HEIGHT'))
+    parser.add_argument('--out', help="PNG path, or '-' for stdout "
+                                      "(default: out/EyeTexture_{w}x{h}.png)")
+    args = parser.parse_args()
+    if args.out:
+        save(eye_image(tuple(args.size)), args.out)
+    else:
+        eye_texture(tuple(args.size))
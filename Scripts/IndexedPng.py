@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+
+# Losslessly recompress PNG images using few colors as indexed PNG:
+#   ./IndexedPng.py [files or directories...] [--write | --out DIR] [--strip]
+# Images with 256 colors or fewer are converted to a palette (with tRNS for
+# transparent colors) at the smallest bit depth, and encoded with the filter
+# and zlib strategy giving the smallest file. The result is decoded again with
+# Pillow and must match the original pixels exactly. Byte savings are
+# reported; files are only written with --write (in place) or --out, and
+# only when smaller. Color management chunks (iCCP, sRGB, gAMA, cHRM) and pHYs
+# are kept unless --strip; text, time and background chunks are dropped.
+# dep: [Pillow](https://pypi.org/project/Pillow/)
+# dep: [NumPy](https://pypi.org/project/numpy/)
+
+import io, zlib, struct, argparse
+import typing as t
+from pathlib import Path
+
+import numpy as np
+from PIL import Image # type: ignore
+
+HERE = Path(__file__).resolve().parent
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+KEPT_CHUNKS = (b'iCCP', b'sRGB', b'gAMA', b'cHRM', b'pHYs')
+STRATEGIES = { 'default': zlib.Z_DEFAULT_STRATEGY, 'filtered': zlib.Z_FILTERED,
+               'rle': zlib.Z_RLE }
+FILTERS = ('none', 'sub', 'up', 'average', 'paeth', 'adaptive')
+
+def chunks(data:bytes) -> t.Iterator[tuple[bytes, bytes]]:
+    offset = len(SIGNATURE)
+    while offset < len(data):
+        length, = struct.unpack_from('>I', data, offset)
+        yield data[offset + 4:offset + 8], data[offset + 8:offset + 8 + length]
+        offset += length + 12
+
+def chunk(type:bytes, data:bytes) -> bytes:
+    return struct.pack('>I', len(data)) + type + data \
+           + struct.pack('>I', zlib.crc32(type + data))
+
+# Palette & indices of an RGBA array: colors packed as uint32 and counted in
+# a single np.unique pass. The palette is sorted by alpha, so that the opaque
+# colors come last and the tRNS chunk stays short.
+def palette(rgba:np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    packed = np.ascontiguousarray(rgba).view('<u4')[..., 0]
+    colors, indices = np.unique(packed, return_inverse=True)
+    colors = colors.view(np.uint8).reshape(-1, 4)
+    order = np.argsort(colors[:, 3], kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return colors[order], rank[indices].reshape(packed.shape)
+
+def bit_depth(colors:int) -> int:
+    return next(d for d in (1, 2, 4, 8) if colors <= 1 << d)
+
+# Scanlines of indices packed at `depth` bits per pixel, most significant
+# bits first.
+def pack_rows(indices:np.ndarray, depth:int) -> np.ndarray:
+    if depth == 8:
+        return indices.astype(np.uint8)
+    per_byte = 8 // depth
+    height, width = indices.shape
+    padded = np.zeros((height, -(-width // per_byte) * per_byte), np.uint8)
+    padded[:, :width] = indices
+    shifts = np.arange(8 - depth, -1, -depth, dtype=np.uint8)
+    groups = padded.reshape(height, -1, per_byte) << shifts
+    return np.bitwise_or.reduce(groups, axis=2).astype(np.uint8)
+
+# Each PNG filter applied to every scanline (1 byte per pixel for indexed
+# images): array of shape (5, height, row bytes).
+def filtered_rows(rows:np.ndarray) -> np.ndarray:
+    x = rows.astype(np.int16)
+    left = np.zeros_like(x); left[:, 1:] = x[:, :-1]
+    up = np.zeros_like(x); up[1:] = x[:-1]
+    up_left = np.zeros_like(x); up_left[1:, 1:] = x[:-1, :-1]
+    p = left + up - up_left
+    pa, pb, pc = np.abs(p - left), np.abs(p - up), np.abs(p - up_left)
+    paeth = np.where((pa <= pb) & (pa <= pc), left,
+                     np.where(pb <= pc, up, up_left))
+    predictors = (0, left, up, (left + up) // 2, paeth)
+    return np.stack([(x - p) & 0xff for p in predictors]).astype(np.uint8)
+
+# Filtered image data: a filter byte followed by the filtered scanline, with
+# the same filter for every row, or the row-wise minimum sum of absolute
+# differences heuristic for 'adaptive'.
+def image_data(filtered:np.ndarray, filter:str) -> bytes:
+    if filter == 'adaptive':
+        cost = np.abs(filtered.astype(np.int8).astype(np.int32)).sum(axis=2)
+        types = np.argmin(cost, axis=0)
+    else:
+        types = np.full(filtered.shape[1], FILTERS.index(filter))
+    rows = filtered[types, np.arange(filtered.shape[1])]
+    return np.hstack([types[:, None].astype(np.uint8), rows]).tobytes()
+
+def compress(data:bytes, strategy:int) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+    return compressor.compress(data) + compressor.flush()
+
+# Smallest indexed PNG encoding of `rgba`, with the filter & strategy used.
+def encode(rgba:np.ndarray, kept:t.Sequence[tuple[bytes, bytes]] = ()
+           ) -> tuple[bytes, str]:
+    colors, indices = palette(rgba)
+    depth = bit_depth(len(colors))
+    filtered = filtered_rows(pack_rows(indices, depth))
+    best = None
+    for filter in FILTERS:
+        data = image_data(filtered, filter)
+        for name, strategy in STRATEGIES.items():
+            idat = compress(data, strategy)
+            if best is None or len(idat) < len(best[0]):
+                best = idat, f'{filter}/{name}'
+    assert best is not None
+
+    height, width = indices.shape
+    alphas = colors[:, 3]
+    transparent = int(np.count_nonzero(alphas < 255))
+    png = SIGNATURE + chunk(b'IHDR',
+        struct.pack('>IIBBBBB', width, height, depth, 3, 0, 0, 0))
+    png += b''.join(chunk(type, data) for type, data in kept
+                    if type != b'pHYs')
+    png += chunk(b'PLTE', colors[:, :3].tobytes())
+    if transparent:
+        png += chunk(b'tRNS', alphas[:transparent].tobytes())
+    png += b''.join(chunk(type, data) for type, data in kept
+                    if type == b'pHYs')
+    png += chunk(b'IDAT', best[0]) + chunk(b'IEND', b'')
+    return png, f'{depth} bit, {best[1]}'
+
+def find_pngs(paths:t.Sequence[Path]) -> list[Path]:
+    result = []
+    for path in paths:
+        result += sorted(path.rglob('*.png')) if path.is_dir() else [path]
+    return result
+
+def main(args:argparse.Namespace):
+    total = saved = 0
+    for path in find_pngs(args.paths):
+        original = path.read_bytes()
+        total += len(original)
+        with Image.open(io.BytesIO(original)) as image:
+            rgba = np.asarray(image.convert('RGBA'))
+        colors = len(np.unique(np.ascontiguousarray(rgba).view('<u4')))
+        if colors > 256:
+            print(f'{path}: {colors} colors, skipped')
+            continue
+
+        kept = [] if args.strip else \
+               [(type, data) for type, data in chunks(original)
+                if type in KEPT_CHUNKS]
+        png, settings = encode(rgba, kept)
+        with Image.open(io.BytesIO(png)) as image:
+            if not np.array_equal(np.asarray(image.convert('RGBA')), rgba):
+                print(f'{path}: round-trip mismatch, skipped')
+                continue
+
+        delta = len(original) - len(png)
+        print(f'{path}: {colors} colors, {len(original)} -> {len(png)} bytes '
+              f'({-delta / len(original):+.0%}, {settings})')
+        if delta <= 0:
+            continue
+        saved += delta
+        if args.write:
+            path.write_bytes(png)
+        elif args.out:
+            args.out.mkdir(parents=True, exist_ok=True)
+            (args.out / path.name).write_bytes(png)
+    if total:
+        print(f'total: {saved} bytes saved of {total} ({saved / total:.0%})')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', type=Path, nargs='*',
+                        default=[HERE.parent / 'PixelArt', HERE.parent / 'Blender'],
+                        help='PNG files or directories (default: ../PixelArt '
+                             '../Blender)')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--write', action='store_true',
+                        help='replace the files which get smaller')
+    output.add_argument('--out', type=Path,
+                        help='write the files which get smaller to DIR')
+    parser.add_argument('--strip', action='store_true',
+                        help='drop the color management & pHYs chunks too')
+    main(parser.parse_args())
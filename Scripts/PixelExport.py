@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# Export pixel art at integer scales, without blurring:
+#   ./PixelExport.py [../PixelArt] [--scales 2 4 8] [--outline auto|#RRGGBB]
+# Images are trimmed to the bounding box of their non-transparent pixels,
+# optionally outlined (1 source pixel, with the darkest color of the image's
+# palette or a given color), then upscaled with nearest neighbor to
+# DIR/01_avatar@2x.png, ... Files are processed in parallel. Inputs unchanged
+# since the last run with the same options (same content hash) are skipped,
+# cf. DIR/.pixelexport.json.
+# dep: [Pillow](https://pypi.org/project/Pillow/)
+# dep: [NumPy](https://pypi.org/project/numpy/)
+
+import json, hashlib, argparse
+import typing as t
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageColor # type: ignore
+
+HERE = Path(__file__).resolve().parent
+
+# Crop an RGBA array to its non-transparent pixels (kept as is when empty).
+def trim(rgba:np.ndarray) -> np.ndarray:
+    opaque = rgba[..., 3] > 0
+    rows, cols = np.flatnonzero(opaque.any(1)), np.flatnonzero(opaque.any(0))
+    if rows.size == 0:
+        return rgba
+    return rgba[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+# Darkest opaque color of the image (by luma), as RGBA.
+def darkest(rgba:np.ndarray) -> np.ndarray:
+    colors = np.unique(rgba[rgba[..., 3] == 255], axis=0)
+    if len(colors) == 0:
+        return np.array([0, 0, 0, 255], np.uint8)
+    luma = colors[:, :3] @ np.array([299, 587, 114])
+    return colors[np.argmin(luma)]
+
+# Color the transparent pixels 4-adjacent to non-transparent ones, after
+# padding the image by 1 pixel so that the outline fits.
+def outline(rgba:np.ndarray, color:np.ndarray) -> np.ndarray:
+    rgba = np.pad(rgba, ((1, 1), (1, 1), (0, 0)))
+    opaque = rgba[..., 3] > 0
+    neighbor = np.zeros_like(opaque)
+    neighbor[1:] |= opaque[:-1]
+    neighbor[:-1] |= opaque[1:]
+    neighbor[:, 1:] |= opaque[:, :-1]
+    neighbor[:, :-1] |= opaque[:, 1:]
+    rgba[neighbor & ~opaque] = color
+    return rgba
+
+def upscale(rgba:np.ndarray, scale:int) -> np.ndarray:
+    return np.repeat(np.repeat(rgba, scale, axis=0), scale, axis=1)
+
+# Export `path` to `out` at each scale. Returns the written files.
+def export(path:Path, out:Path, scales:t.Sequence[int], trimmed:bool,
+           outline_color:t.Optional[str]) -> list[Path]:
+    with Image.open(path) as image:
+        rgba = np.asarray(image.convert('RGBA'))
+    if trimmed:
+        rgba = trim(rgba)
+    if outline_color == 'auto':
+        rgba = outline(rgba, darkest(rgba))
+    elif outline_color:
+        rgba = outline(rgba, np.array(ImageColor.getcolor(outline_color, 'RGBA'),
+                                      np.uint8))
+    written = []
+    for scale in scales:
+        target = out / f'{path.stem}@{scale}x.png'
+        Image.fromarray(upscale(rgba, scale)).save(target, optimize=True)
+        written.append(target)
+    return written
+
+def find_images(paths:t.Sequence[Path]) -> list[Path]:
+    result = []
+    for path in paths:
+        result += sorted(path.glob('*.png')) if path.is_dir() else [path]
+    return result
+
+def file_hash(path:Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+def main(args:argparse.Namespace):
+    args.out.mkdir(parents=True, exist_ok=True)
+    state_path = args.out / '.pixelexport.json'
+    state = json.loads(state_path.read_text()) if state_path.exists() else {}
+    options = [args.scales, not args.no_trim, args.outline]
+
+    # skip inputs whose content & options did not change
+    todo = []
+    for path in find_images(args.paths):
+        key = hashlib.sha256(f'{file_hash(path)} {options}'.encode()).hexdigest()
+        entry = state.get(str(path.resolve()))
+        if args.force or entry != key or not all(
+            (args.out / f'{path.stem}@{s}x.png').exists() for s in args.scales
+        ):
+            todo.append((path, key))
+    print(f'{len(todo)} images to export')
+
+    with ProcessPoolExecutor(max_workers=args.jobs or None) as pool:
+        futures = { (path, key): pool.submit(export, path, args.out, args.scales,
+                                             not args.no_trim, args.outline)
+                    for path, key in todo }
+        for (path, key), future in futures.items():
+            try:
+                written = future.result()
+            except Exception as e:
+                print(f'{path}: {e}')
+                continue
+            state[str(path.resolve())] = key
+            print(f"{path}: {', '.join(p.name for p in written)}")
+
+    state_path.write_text(json.dumps(state, indent=1))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', type=Path, nargs='*',
+                        default=[HERE.parent / 'PixelArt'],
+                        help='PNG files or directories (default: ../PixelArt)')
+    parser.add_argument('--scales', type=int, nargs='+', default=[2, 4, 8])
+    parser.add_argument('--outline', metavar='auto|COLOR',
+                        help="1 pixel outline, 'auto' for the darkest color of "
+                             "each image")
+    parser.add_argument('--no-trim', action='store_true',
+                        help='keep transparent borders')
+    parser.add_argument('--out', type=Path, default=Path('out/PixelExport'))
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='worker processes (default: cpu count)')
+    parser.add_argument('--force', action='store_true',
+                        help='export unchanged images too')
+    main(parser.parse_args())
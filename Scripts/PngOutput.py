@@ -0,0 +1,19 @@
+# PNG output of the image generators (EyeTexture, DimetricGrid).
+# dep: [Pillow](https://pypi.org/project/Pillow/)
+
+import sys
+import typing as t
+from pathlib import Path
+
+from PIL import Image # type: ignore
+
+# Write `image` as PNG to a path (creating its directories), a binary file
+# object, or stdout for '-'.
+def save_png(image:Image.Image, target:t.Union[str, Path, t.BinaryIO]):
+    if target == '-':
+        image.save(sys.stdout.buffer, format='PNG')
+    elif hasattr(target, 'write'):
+        image.save(target, format='PNG')
+    else:
+        Path(target).parent.mkdir(parents=True, exist_ok=True)
+        image.save(target, format='PNG')
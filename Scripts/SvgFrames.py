@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+
+# Render the CSS animation of an SVG file to a looping sprite sheet & APNG:
+#   ./SvgFrames.py [../SVG/MagitekCircle.svg] [--fps 12] [--scale 1] [--out DIR]
+# The @keyframes and `animation` declarations of the <style> element are
+# evaluated at each frame time (linear timing, on #id rules). The loop starts
+# once the finite animations (e.g. fade-ins) are over and lasts the least
+# common multiple of the infinite ones; --intro prepends the frames before it
+# to the sprite sheet (its JSON gives the loop start) and writes them to a
+# separate APNG played once, so that the looping APNG never replays them.
+# Frames are composited from layers: consecutive static elements are rendered
+# once together, and each animated element is rendered once per distinct
+# state, its rotation and opacity being applied to the rendered layer. Only
+# the frames of the intro (e.g. stroke dash animations) render more layers.
+# Layers are rendered with resvg, or CairoSVG (no CSS filters); frames are
+# composited in parallel. Scripts are not run.
+# dep: [Pillow](https://pypi.org/project/Pillow/)
+# dep: [NumPy](https://pypi.org/project/numpy/)
+# dep: [resvg](https://github.com/linebender/resvg) or [CairoSVG](https://pypi.org/project/CairoSVG/)
+
+import io, re, copy, json, math, shutil, argparse, tempfile, subprocess
+import typing as t
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image, ImageColor # type: ignore
+
+HERE = Path(__file__).resolve().parent
+SVG_NS = 'http://www.w3.org/2000/svg'
+NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)')
+NOT_DRAWN = ('style', 'defs', 'script', 'title', 'desc', 'metadata')
+
+def local_name(element:ET.Element) -> str:
+    return element.tag.rpartition('}')[2]
+
+def parse_time(token:str) -> float:
+    return float(token[:-2]) / 1000 if token.endswith('ms') else float(token[:-1])
+
+# Split on commas outside of parentheses, e.g. the animations of a shorthand.
+def split_top(value:str, separator:str = ',') -> list[str]:
+    parts, depth, start = [], 0, 0
+    for i, c in enumerate(value):
+        depth += (c == '(') - (c == ')')
+        if c == separator and depth == 0:
+            parts.append(value[start:i])
+            start = i + 1
+    return [p.strip() for p in parts + [value[start:]] if p.strip()]
+
+def declarations(block:str) -> dict[str, str]:
+    result = {}
+    for item in split_top(block, ';'):
+        name, _, value = item.partition(':')
+        result[name.strip()] = value.strip()
+    return result
+
+# Interpolate two values of the same shape (same text around the numbers),
+# e.g. 'scale(0.95) rotate(0deg)' and 'scale(0.95) rotate(360deg)'. Values of
+# different shapes switch halfway.
+def interpolate(a:str, b:str, p:float) -> str:
+    if NUMBER.sub('', a) != NUMBER.sub('', b):
+        return a if p < 0.5 else b
+    numbers = iter(NUMBER.findall(b))
+    def mix(match:re.Match) -> str:
+        start = float(match[0])
+        return f'{start + (float(next(numbers)) - start) * p:g}'
+    return NUMBER.sub(mix, a)
+
+@dataclass
+class Animation:
+    name: str
+    duration: float
+    delay: float = 0.0
+    count: float = 1.0
+    direction: str = 'normal'
+    fill: str = 'none'
+
+    @classmethod
+    def parse(cls, shorthand:str) -> 'Animation':
+        animation = cls('', 0.0)
+        times = []
+        for token in shorthand.split():
+            if re.fullmatch(r'[-+]?[\d.]+m?s', token):
+                times.append(parse_time(token))
+            elif token == 'infinite':
+                animation.count = math.inf
+            elif NUMBER.fullmatch(token):
+                animation.count = float(token)
+            elif token in ('normal', 'reverse', 'alternate', 'alternate-reverse'):
+                animation.direction = token
+            elif token in ('none', 'forwards', 'backwards', 'both'):
+                animation.fill = token
+            elif token in ('linear', 'running', 'paused'):
+                pass
+            elif token.startswith(('ease', 'cubic-bezier', 'steps')):
+                print(f'{token} timing is rendered as linear')
+            else:
+                animation.name = token
+        animation.duration, animation.delay = (times + [0.0, 0.0])[:2]
+        return animation
+
+    # Progress in the keyframes at `time`, or None when not applied.
+    def progress(self, time:float) -> t.Optional[float]:
+        elapsed = (time - self.delay) / self.duration if self.duration else math.inf
+        if elapsed < 0:
+            if self.fill not in ('backwards', 'both'):
+                return None
+            elapsed = 0.0
+        if elapsed >= self.count:
+            if self.fill not in ('forwards', 'both'):
+                return None
+            iteration, p = self.count - 1, 1.0
+            if self.count % 1:
+                iteration, p = math.floor(self.count), self.count % 1
+        else:
+            iteration, p = math.floor(elapsed), elapsed % 1
+        reverse = self.direction in ('reverse', 'alternate-reverse')
+        if self.direction.startswith('alternate') and iteration % 2:
+            reverse = not reverse
+        return 1 - p if reverse else p
+
+    def end(self) -> float:
+        return self.delay + self.duration * self.count
+
+class Stylesheet:
+    def __init__(self, text:str):
+        text = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+        self.keyframes: dict[str, list[tuple[float, dict[str, str]]]] = {}
+        def keyframes(match:re.Match) -> str:
+            frames = []
+            for selectors, block in re.findall(r'([^{}]+)\{([^{}]*)\}', match[2]):
+                for selector in selectors.split(','):
+                    selector = selector.strip()
+                    offset = {'from': 0.0, 'to': 1.0}.get(selector)
+                    if offset is None:
+                        offset = float(selector.rstrip('%')) / 100
+                    frames.append((offset, declarations(block)))
+            self.keyframes[match[1]] = sorted(frames, key=lambda f: f[0])
+            return ''
+        text = re.sub(r'@keyframes\s+([\w-]+)\s*\{((?:[^{}]*\{[^{}]*\})*)\s*\}',
+                      keyframes, text)
+        self.rules = [(selector.strip(), declarations(block)) for selector, block
+                      in re.findall(r'([^{}]+)\{([^{}]*)\}', text)]
+        self.variables = { name: value for selector, block in self.rules
+                           if selector == ':root'
+                           for name, value in block.items()
+                           if name.startswith('--') }
+
+    def resolve(self, value:str) -> str:
+        return re.sub(r'var\((--[\w-]+)\)',
+                      lambda m: self.resolve(self.variables.get(m[1], '')), value)
+
+    # Declarations of the `#id` rules.
+    def by_id(self, id:str) -> dict[str, str]:
+        result: dict[str, str] = {}
+        for selector, block in self.rules:
+            if selector == f'#{id}':
+                result.update(block)
+        return result
+
+    # Keyframe properties of an animation at progress p.
+    def keyframe(self, name:str, p:float) -> dict[str, str]:
+        frames = self.keyframes.get(name, [])
+        result = {}
+        for property in {n for _, block in frames for n in block}:
+            defined = [(o, b[property]) for o, b in frames if property in b]
+            before = [f for f in defined if f[0] <= p] or defined[:1]
+            after = [f for f in defined if f[0] >= p] or defined[-1:]
+            (o0, v0), (o1, v1) = before[-1], after[0]
+            result[property] = v0 if o1 == o0 else \
+                               interpolate(v0, v1, (p - o0) / (o1 - o0))
+        return result
+
+    # Rules without the animations & transforms (applied as attributes
+    # instead) and with the custom properties resolved.
+    def flat(self) -> str:
+        skipped = ('animation', 'transform', 'transform-origin', 'background')
+        lines = []
+        for selector, block in self.rules:
+            block = { n: self.resolve(v) for n, v in block.items()
+                      if not n.startswith('--') and n not in skipped }
+            if block:
+                body = ' '.join(f'{n}: {v};' for n, v in block.items())
+                lines.append(f'{selector} {{ {body} }}')
+        return '\n'.join(lines)
+
+# Rotation angle (degrees, clockwise) of a CSS transform made of rotations &
+# uniform scales, which commute about the same origin, and the transform
+# without it. Other transforms keep their rotation.
+def split_rotation(transform:str) -> tuple[float, str]:
+    functions = re.findall(r'([\w]+)\(([^)]*)\)', transform)
+    def uniform(name:str, args:str) -> bool:
+        values = NUMBER.findall(args)
+        return name == 'scale' and len(set(values)) == 1
+    if not all(name == 'rotate' or uniform(name, args)
+               for name, args in functions):
+        return 0.0, transform
+    angle = sum(float(NUMBER.findall(args)[0]) for name, args in functions
+                if name == 'rotate')
+    rest = ' '.join(f'{name}({args})' for name, args in functions
+                    if name != 'rotate')
+    return angle, rest
+
+class Document:
+    def __init__(self, path:Path):
+        ET.register_namespace('', SVG_NS)
+        ET.register_namespace('xlink', 'http://www.w3.org/1999/xlink')
+        self.root = ET.parse(path).getroot()
+        style = next((e for e in self.root.iter() if local_name(e) == 'style'),
+                     None)
+        self.style = Stylesheet(style.text or '' if style is not None else '')
+        self.width = float(self.root.get('width', '300').rstrip('px'))
+        self.height = float(self.root.get('height', '150').rstrip('px'))
+        self.background = self.style.resolve(
+            next((b['background'] for s, b in self.style.rules
+                  if s == ':root' and 'background' in b), 'transparent'))
+        self.drawn = [e for e in self.root if local_name(e) not in NOT_DRAWN]
+        self.animations = {
+            e.get('id'): [Animation.parse(a) for a in split_top(
+                self.style.by_id(e.get('id', '')).get('animation', ''))]
+            for e in self.drawn if e.get('id')
+        }
+        self.animations = { id: a for id, a in self.animations.items() if a }
+
+    # Loop start & duration: once the finite animations are over, for the
+    # least common multiple of the infinite animations' durations.
+    def loop(self) -> tuple[float, float]:
+        animations = [a for anims in self.animations.values() for a in anims]
+        start = max([a.end() for a in animations if a.count != math.inf] + [0.0])
+        periods = [round(a.duration * 1000) for a in animations
+                   if a.count == math.inf and a.duration]
+        return start, (math.lcm(*periods) / 1000 if periods else 0.0)
+
+    # Animated properties of an element at `time` (later animations win).
+    def properties(self, id:str, time:float) -> dict[str, str]:
+        result = {}
+        for animation in self.animations.get(id, []):
+            p = animation.progress(time)
+            if p is not None:
+                result.update(self.style.keyframe(animation.name, p))
+        return result
+
+    # Standalone SVG of some elements (by index in self.drawn), with their
+    # transform and other properties overridden, without animations.
+    def svg(self, indices:t.Sequence[int],
+            overrides:t.Mapping[int, t.Mapping[str, str]] = {}) -> str:
+        root = copy.deepcopy(self.root)
+        drawn = [e for e in root if local_name(e) not in NOT_DRAWN]
+        diagonal = math.hypot(self.width, self.height) / math.sqrt(2)
+        for i, element in enumerate(drawn):
+            if i not in indices:
+                root.remove(element)
+                continue
+            properties = { **self.style.by_id(element.get('id', '')),
+                           **overrides.get(i, {}) }
+            transform = properties.pop('transform', '')
+            if transform:
+                svg_transform = re.sub(r'([-+\d.]+)deg', r'\1', transform)
+                cx, cy = self.width / 2, self.height / 2
+                element.set('transform', f'translate({cx:g} {cy:g}) '
+                            f'{svg_transform} translate({-cx:g} {-cy:g})')
+            style = []
+            for name, value in properties.items():
+                if name.startswith('stroke-dash'): # percentages of the diagonal
+                    value = re.sub(r'([-+\d.]+)%',
+                        lambda m: f'{float(m[1]) / 100 * diagonal:g}', value)
+                if name not in ('animation', 'transform-origin'):
+                    style.append(f'{name}: {self.style.resolve(value)}')
+            if style and overrides.get(i):
+                element.set('style', '; '.join(style))
+        for element in list(root):
+            if local_name(element) == 'script':
+                root.remove(element)
+            elif local_name(element) == 'style':
+                element.text = self.style.flat()
+        return ET.tostring(root, encoding='unicode')
+
+@dataclass(frozen=True)
+class Layer:
+    indices: tuple[int, ...]
+    overrides: tuple[tuple[str, str], ...] = ()
+
+# A frame: layers to composite in order, each with its rotation (degrees,
+# clockwise) and opacity.
+Frame = list[tuple[Layer, float, float]]
+
+def plan(document:Document, time:float) -> Frame:
+    frame: Frame = []
+    static: list[int] = []
+    for i, element in enumerate(document.drawn):
+        id = element.get('id')
+        if id not in document.animations:
+            static.append(i)
+            continue
+        if static:
+            frame.append((Layer(tuple(static)), 0.0, 1.0))
+            static = []
+        properties = { **document.style.by_id(id), **document.properties(id, time) }
+        angle, properties['transform'] = split_rotation(
+            properties.get('transform', ''))
+        opacity = float(properties.pop('opacity', '1'))
+        properties = { n: v for n, v in properties.items()
+                       if n in document.properties(id, time) or n == 'transform' }
+        if opacity > 0:
+            frame.append((Layer((i,), tuple(sorted(properties.items()))),
+                          angle, opacity))
+    if static:
+        frame.append((Layer(tuple(static)), 0.0, 1.0))
+    return frame
+
+def render_resvg(svg:str, width:int, height:int) -> Image.Image:
+    with tempfile.TemporaryDirectory() as tmp:
+        source, target = Path(tmp) / 'layer.svg', Path(tmp) / 'layer.png'
+        source.write_text(svg)
+        subprocess.run(['resvg', '-w', str(width), '-h', str(height),
+                        str(source), str(target)], check=True)
+        return Image.open(target).convert('RGBA')
+
+def render_cairosvg(svg:str, width:int, height:int) -> Image.Image:
+    import cairosvg # type: ignore
+    png = cairosvg.svg2png(bytestring=svg.encode(), output_width=width,
+                           output_height=height)
+    return Image.open(io.BytesIO(png)).convert('RGBA')
+
+def renderer(name:str) -> t.Callable[[str, int, int], Image.Image]:
+    if name in ('auto', 'resvg') and shutil.which('resvg'):
+        return render_resvg
+    if name in ('auto', 'cairosvg'):
+        try:
+            import cairosvg # type: ignore
+            return render_cairosvg
+        except ImportError:
+            pass
+    raise SystemExit(f'renderer not found: {name}, install resvg or CairoSVG')
+
+# Rendered layers, set in each compositing process.
+layers: dict[Layer, Image.Image] = {}
+
+def init_layers(rendered:dict[Layer, Image.Image]):
+    global layers
+    layers = rendered
+
+def composite(frame:Frame, size:tuple[int, int],
+              background:tuple[int, int, int, int]) -> Image.Image:
+    image = Image.new('RGBA', size, background)
+    center = (size[0] / 2, size[1] / 2)
+    for layer, angle, opacity in frame:
+        rendered = layers[layer]
+        if angle % 360:
+            # premultiplied, so that transparent pixels do not bleed in
+            rendered = rendered.convert('RGBa').rotate(
+                -angle, resample=Image.Resampling.BICUBIC, center=center
+            ).convert('RGBA')
+        if opacity < 1:
+            rgba = np.array(rendered)
+            rgba[..., 3] = (rgba[..., 3] * opacity).round().astype(np.uint8)
+            rendered = Image.fromarray(rgba)
+        image.alpha_composite(rendered)
+    return image
+
+def main(args:argparse.Namespace):
+    document = Document(args.svg)
+    start, period = document.loop()
+    if period == 0:
+        raise SystemExit('no infinite animation to loop')
+    count = max(1, round(period * args.fps))
+    times = [start + period * i / count for i in range(count)]
+    if args.intro:
+        times = [i / args.fps for i in range(math.floor(start * args.fps))] + times
+    size = (round(document.width * args.scale), round(document.height * args.scale))
+    background = ImageColor.getcolor(document.background, 'RGBA') \
+                 if args.background and document.background != 'transparent' \
+                 else (0, 0, 0, 0)
+
+    frames = [plan(document, t) for t in times]
+    unique = list(dict.fromkeys(layer for frame in frames for layer, _, _ in frame))
+    render = renderer(args.renderer)
+    print(f'{len(frames)} frames ({period:g}s loop from {start:g}s), '
+          f'{len(unique)} layers to render')
+    def render_layer(layer:Layer) -> Image.Image:
+        svg = document.svg(layer.indices,
+                           { layer.indices[0]: dict(layer.overrides) }
+                           if layer.overrides else {})
+        return render(svg, *size)
+    with ThreadPoolExecutor(max_workers=args.jobs or None) as pool:
+        rendered = dict(zip(unique, pool.map(render_layer, unique)))
+
+    with ProcessPoolExecutor(max_workers=args.jobs or None,
+                             initializer=init_layers,
+                             initargs=(rendered,)) as pool:
+        images = list(pool.map(composite, frames, [size] * len(frames),
+                               [background] * len(frames)))
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    stem = args.svg.stem
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    sheet = Image.new('RGBA', (columns * size[0], rows * size[1]))
+    for i, image in enumerate(images):
+        sheet.paste(image, ((i % columns) * size[0], (i // columns) * size[1]))
+    sheet.save(args.out / f'{stem}_sheet.png', optimize=True)
+    (args.out / f'{stem}_sheet.json').write_text(json.dumps({
+        'image': f'{stem}_sheet.png', 'frame_size': list(size),
+        'columns': columns, 'frames': len(images), 'fps': args.fps,
+        'loop_start': len(times) - count,
+    }, indent=1))
+    intro = len(times) - count
+    def save_apng(path:Path, frames:list[Image.Image], loop:int):
+        frames[0].save(path, format='PNG', save_all=True,
+                       append_images=frames[1:], duration=1000 / args.fps,
+                       loop=loop, disposal=1)
+    save_apng(args.out / f'{stem}.apng', images[intro:], loop=0) # forever
+    if intro:
+        save_apng(args.out / f'{stem}_intro.apng', images[:intro], loop=1) # once
+    print(f"written: {', '.join(p.name for p in sorted(args.out.glob(stem + '*')))}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('svg', type=Path, nargs='?',
+                        default=HERE.parent / 'SVG/MagitekCircle.svg')
+    parser.add_argument('--fps', type=float, default=12)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--intro', action='store_true',
+                        help='add the frames before the loop, to the sprite '
+                             'sheet and as a separate APNG')
+    parser.add_argument('--background', action='store_true',
+                        help="fill with the :root background (default: transparent)")
+    parser.add_argument('--renderer', default='auto',
+                        choices=('auto', 'resvg', 'cairosvg'))
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='parallel renders & composites (default: cpu count)')
+    parser.add_argument('--out', type=Path, default=Path('out/SvgFrames'))
+    main(parser.parse_args())